@@ -1,171 +1,570 @@
 import math
-from typing import Any, Callable, Dict, List
+from functools import lru_cache
+from typing import Any, Callable, Dict
 
-from utils import Point, PointF, sign
+import numpy as np
 
-def draw_line(p_list:List[Point], algorithm:str) -> List[Point]:
+from utils import Point, PointList, as_point_list, sign
+
+def _accumulate(start:np.ndarray, step:np.ndarray, count:np.ndarray) -> np.ndarray:
+    """逐段计算 start, start+step, (start+step)+step, ...，与逐步累加得到的浮点数完全一致
+
+    :param start: (array of float) 每段的初值
+    :param step: (array of float) 每段的增量
+    :param count: (array of int) 每段的元素个数
+    :return: (array of float) 按段顺序拼接的累加结果
+    """
+    out = np.empty(int(count.sum()))
+    offsets = np.cumsum(count) - count
+    # 按长度分桶，桶内逐行累加，补齐带来的浪费不超过一倍
+    bucket = np.frexp(count)[1]
+    for b in np.unique(bucket):
+        rows = np.nonzero(bucket == b)[0]
+        n = count[rows]
+        width = int(n.max())
+        mat = np.empty((len(rows), width))
+        mat[:, 0] = start[rows]
+        mat[:, 1:] = step[rows, None]
+        mat = np.add.accumulate(mat, axis=1)
+        cols = np.arange(width)
+        mask = cols < n[:, None]
+        out[(offsets[rows, None] + cols)[mask]] = mat[mask]
+    return out
+
+WINDOW_MARGIN = 2  # 按窗口裁剪时向外多保留的像素，保证窗口内的像素与完整绘制时一致
+
+def _expand(window:tuple, margin:int = WINDOW_MARGIN) -> tuple:
+    x_min,y_min,x_max,y_max = _normalize_window(window)
+    return x_min - margin,y_min - margin,x_max + margin,y_max + margin
+
+def _rasterize_segment(x0:int, y0:int, x1:int, y1:int, algorithm:str) -> np.ndarray:
+    """绘制单条线段，按步数直接写出像素坐标，省去批量绘制时分组和展开的开销
+
+    :return: (array of int) 像素点坐标，形状为(N,2)，与rasterize_lines的结果相同
+    """
+    dx,dy = x1 - x0,y1 - y0
+    sign_x,sign_y = sign(dx),sign(dy)
+    if dx == 0:
+        out = np.empty((abs(dy) + 1, 2), dtype=np.int64)
+        out[:, 0] = x0
+        out[:, 1] = np.arange(abs(dy) + 1) * sign_y + y0
+        return out
+    k = (-dy) / (-dx)
+    steep = algorithm != 'Naive' and abs(dy) > abs(dx)
+    # 沿主方向每步前进一个像素，次方向的坐标由各算法给出
+    major,minor = (1,0) if steep else (0,1)
+    n = (abs(dy) if steep else abs(dx)) + 1
+    i = np.arange(n)
+    out = np.empty((n, 2), dtype=np.int64)
+    out[:, major] = i * (sign_y if steep else sign_x) + (y0 if steep else x0)
+    if algorithm == 'Naive':
+        out[:, minor] = np.rint(k * (sign_x * i) + y0)
+    elif algorithm == 'DDA':
+        acc = np.full(n, sign_y / k if steep else sign_x * k)
+        acc[0] = x0 if steep else y0
+        out[:, minor] = np.rint(np.add.accumulate(acc))
+    else:
+        adx,ady = abs(dx),abs(dy)
+        if steep:
+            out[:, minor] = (2 * adx * i + ady - 1) // (2 * ady) * sign_x + x0
+        else:
+            out[:, minor] = (2 * ady * i + adx - 1) // (2 * adx) * sign_y + y0
+    return out
+
+def rasterize_lines(segments, algorithm:str, window:tuple|None = None) -> np.ndarray:
+    """批量绘制线段，结果与逐条调用draw_line一致
+
+    :param segments: (array of int: [[x0, y0, x1, y1], ...]) 线段的起点和终点坐标，形状为(M,4)或(M,2,2)
+    :param algorithm: (string) 绘制使用的算法，包括'Naive'、'DDA'和'Bresenham'
+    :param window: (tuple of int) 可见窗口 (x_min, y_min, x_max, y_max)，给出时只生成窗口附近的像素，
+                   窗口内的像素与完整绘制时相同
+    :return: (array of int: [[x_0, y_0], [x_1, y_1], ...]) 按线段顺序拼接的像素点坐标，形状为(N,2)
+    """
+    seg = np.asarray(segments, dtype=np.int64).reshape(-1, 4)
+    if len(seg) == 1 and window is None:
+        return _rasterize_segment(*seg[0].tolist(), algorithm)
+    x0,y0,x1,y1 = seg.T
+    dx,dy = x1 - x0,y1 - y0
+    adx,ady = np.abs(dx),np.abs(dy)
+    vertical = dx == 0
+    if algorithm == 'Naive':
+        count = np.where(vertical, ady, adx) + 1
+    else:
+        count = np.maximum(adx, ady) + 1
+    offset = np.zeros_like(count)  # 每条线段第一个像素的步数
+    if window is not None:
+        # 由线段参数在窗口内的范围得到步数范围，两端各多留一步
+        rn1,rn2,keep = _clip_params(seg, _expand(window))
+        last = count - 1
+        lo = np.clip(np.floor(rn1 * last).astype(np.int64) - 1, 0, last)
+        hi = np.clip(np.ceil(rn2 * last).astype(np.int64) + 1, 0, last)
+        offset,count = lo,np.where(keep, hi - lo + 1, 0)
+    rows = np.nonzero(count)[0]
+    if len(rows) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    x0,y0,dx,dy,adx,ady,vertical,count,offset = (a[rows] for a in (x0,y0,dx,dy,adx,ady,vertical,count,offset))
+    sign_x,sign_y = np.sign(dx),np.sign(dy)
+    steep = ady > adx
+    seg_id = np.repeat(np.arange(len(rows)), count)
+    first = np.cumsum(count) - count
+    i = np.arange(int(count.sum())) - np.repeat(first - offset, count)
+    n_acc = offset + count
+    x0,y0,dx,dy,adx,ady = x0[seg_id],y0[seg_id],dx[seg_id],dy[seg_id],adx[seg_id],ady[seg_id]
+    sign_x,sign_y,vertical,steep = sign_x[seg_id],sign_y[seg_id],vertical[seg_id],steep[seg_id]
+    # 沿y方向步进：竖直线，以及除Naive外斜率绝对值大于1的线段
+    along_y = vertical if algorithm == 'Naive' else steep
+    x = np.where(along_y, x0, x0 + sign_x * i)
+    y = np.where(along_y, y0 + sign_y * i, y0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(vertical, 0.0, (-dy) / np.where(vertical, 1, -dx))
+        if algorithm == 'Naive':
+            y = np.where(vertical, y, np.rint(k * (sign_x * i) + y0).astype(np.int64))
+        elif algorithm == 'DDA':
+            step = np.where(steep, sign_y / np.where(k == 0, 1, k), sign_x * k)
+            start = np.where(steep, x0, y0).astype(np.float64)
+            # 浮点累加必须从起点逐步进行，因此累加到窗口内最后一步再取出需要的部分
+            acc = _accumulate(start[first], step[first], n_acc)
+            acc = np.rint(acc[np.repeat(np.cumsum(n_acc) - n_acc, count) + i]).astype(np.int64)
+            x = np.where(steep & ~vertical, acc, x)
+            y = np.where(steep | vertical, y, acc)
+        else:
+            minor = np.where(steep, (2 * adx * i + ady - 1) // np.maximum(2 * ady, 1),
+                             (2 * ady * i + adx - 1) // np.maximum(2 * adx, 1))
+            x = np.where(steep & ~vertical, x0 + sign_x * minor, x)
+            y = np.where(steep, y, y0 + sign_y * minor)
+    return np.stack([x, y], axis=1)
+
+def _in_window(pts:np.ndarray, window:tuple|None) -> np.ndarray:
+    """保留窗口附近的像素点"""
+    if window is None:
+        return pts
+    x_min,y_min,x_max,y_max = _expand(window)
+    return pts[(pts[:, 0] >= x_min) & (pts[:, 0] <= x_max) & (pts[:, 1] >= y_min) & (pts[:, 1] <= y_max)]
+
+def rasterize_line(p0:Point, p1:Point, algorithm:str) -> np.ndarray:
+    """绘制单条线段
+
+    :param p0: 线段起点
+    :param p1: 线段终点
+    :param algorithm: (string) 绘制使用的算法，包括'Naive'、'DDA'和'Bresenham'
+    :return: (array of int: [[x_0, y_0], [x_1, y_1], ...]) 绘制结果的像素点坐标，形状为(N,2)
+    """
+    return rasterize_lines([[p0.x, p0.y, p1.x, p1.y]], algorithm)
+
+def draw_line(p_list:PointList, algorithm:str, window:tuple|None = None) -> PointList:
     """绘制线段
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 线段的起点和终点坐标
     :param algorithm: (string) 绘制使用的算法，包括'DDA'和'Bresenham'，此处的'Naive'仅作为示例，测试时不会出现
+    :param window: (tuple of int) 可见窗口，给出时只绘制窗口附近的部分，以下各绘制函数相同
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
     """
+    p_list = as_point_list(p_list)
     if len(p_list) < 2:
         return p_list
-    a,b = p_list[0].copy(),p_list[1].copy()
-    if a.equal(b):
-        return [a]
-    result:List[Point] = []
-    
-    sign_x,sign_y = sign(b.x-a.x),sign(b.y-a.y)
-    if a.x == b.x:
-        for y in range(a.y,b.y+sign_y,sign_y):
-            result.append(Point(a.x,y))
-        return result
-    k = a.slope(b)
-    if algorithm == 'Naive':	
-        for x in range(a.x,b.x+sign_x,sign_x):
-            result.append(Point(x,k*(x-a.x)+a.y))	
-    elif algorithm == 'DDA':
-        if abs(k) > 1:
-            x_step =  sign_y / k
-            x_begin = a.x
-            for y in range(a.y,b.y+sign_y,sign_y):
-                result.append(Point(x_begin,y))
-                x_begin += x_step
-        else:
-            y_step =  sign_x * k
-            y_begin = a.y
-            for x in range(a.x,b.x+sign_x,sign_x):
-                result.append(Point(x,y_begin))
-                y_begin += y_step
-    else:
-        dy = abs(b.y-a.y)
-        dx = abs(b.x-a.x)
-        if abs(k) > 1:
-            p = 2 * dx -dy
-            x_begin = a.x
-            for y in range(a.y,b.y+sign_y,sign_y):
-                result.append(Point(x_begin,y))
-                if p > 0:
-                    x_begin += sign_x
-                    p -= 2*dy
-                p += 2 * dx
-        else:
-            p = 2 * dy - dx
-            y_begin = a.y
-            for x in range(a.x,b.x+sign_x,sign_x):
-                result.append(Point(x,y_begin))
-                if p > 0:
-                    y_begin += sign_y
-                    p -= 2*dx
-                p += 2 *dy
-    return result
-
-def draw_polygon(p_list:List[Point], algorithm:str) -> List[Point]:
+    return PointList(rasterize_lines(p_list.array[:2].reshape(1, 4), algorithm, window))
+
+def draw_polygon(p_list:PointList, algorithm:str, window:tuple|None = None) -> PointList:
     """绘制多边形
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
     :param algorithm: (string) 绘制使用的算法，包括'DDA'和'Bresenham'
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
     """
+    p_list = as_point_list(p_list)
     if len(p_list) == 2:
-        return draw_line(p_list,algorithm)
-    result:list[Point] = []
-    for i in range(len(p_list)):
-        result.extend(draw_line([p_list[i - 1], p_list[i]], algorithm))        
-    return result
-
-def draw_rect(p_list:List[Point],algorithm:str) -> List[Point]:
-    p0,p1 = p_list[0:2]
+        return draw_line(p_list,algorithm,window)
+    pts = p_list.array
+    return PointList(rasterize_lines(np.hstack([np.roll(pts, 1, axis=0), pts]), algorithm, window))
+
+def draw_rect(p_list:PointList,algorithm:str,window:tuple|None = None) -> PointList:
+    p_list = as_point_list(p_list)
+    p0,p1 = p_list[0],p_list[1]
     sign_x,sign_y = sign(p1.x - p0.x),sign(p1.y-p0.y)
-    res:List[Point] = []
     if sign_x == 0 or sign_y == 0:
-        return res
-    for x in range(p0.x,p1.x+sign_x,sign_x):
-        res.extend([Point(x,p0.y),Point(x,p1.y)])
-    for y in range(p0.y,p1.y+sign_y,sign_y):
-        res.extend([Point(p0.x,y),Point(p1.x,y)])
-    return res
+        return PointList()
+    xs = np.arange(p0.x,p1.x+sign_x,sign_x)
+    ys = np.arange(p0.y,p1.y+sign_y,sign_y)
+    horizontal = np.stack([np.repeat(xs,2),np.tile([p0.y,p1.y],len(xs))],axis=1)
+    vertical = np.stack([np.tile([p0.x,p1.x],len(ys)),np.repeat(ys,2)],axis=1)
+    return PointList(_in_window(np.concatenate([horizontal,vertical]),window))
+
+ELLIPSE_OVERLAP = 0.8    # 逐行与逐列两部分在斜率接近1处重叠的程度，避免交界处漏掉像素
+ELLIPSE_TANGENT = 1e-9   # 判别式相对于此值以内视为与行或列相切
+
+def _conic(axes:np.ndarray) -> tuple:
+    """椭圆方程 d^T Q d = 1 的系数，其中 d = p - center，Q = (axes axes^T)^-1 = [[a, b], [b, e]]
+
+    :return: (a, b, e, b*b - a*e, 包围盒的半宽, 包围盒的半高)
+    """
+    m = axes @ axes.T
+    a,b,e = np.linalg.inv(m).ravel()[[0,1,3]]
+    return a,b,e,b * b - a * e,math.sqrt(m[0,0]),math.sqrt(m[1,1])
+
+def rasterize_ellipse(center:np.ndarray, axes:np.ndarray, window:tuple|None = None) -> np.ndarray:
+    """光栅化任意方向的椭圆 center + axes @ (cos t, sin t)，每个像素只输出一次
+
+    曲线较陡的部分逐行求与二次曲线的交点，较平的部分逐列求交点，两部分以梯度方向划分，
+    与中点算法的两个区域相当，但全部交点一次算出
+
+    :param center: (array of float) 椭圆中心，形状为(2,)
+    :param axes: (array of float) 两列分别为两条共轭半径，形状为(2,2)
+    :param window: (tuple of int) 可见窗口，给出时只对窗口附近的行和列求交点
+    :return: (array of int) 像素点坐标，形状为(N,2)
+    """
+    cx,cy = center
+    wx0,wy0,wx1,wy1 = _expand(window) if window is not None else (-math.inf,-math.inf,math.inf,math.inf)
+    u,s,_ = np.linalg.svd(axes)
+    if s[1] < 1e-9:
+        # 退化为线段（或一个点）
+        d = u[:, 0] * s[0]
+        p0,p1 = np.floor(center - d + 0.5).astype(np.int64),np.floor(center + d + 0.5).astype(np.int64)
+        return rasterize_lines(np.array([[p0[0],p0[1],p1[0],p1[1]]]),'Bresenham',window)
+    a,b,e,det,hx,hy = _conic(axes)
+    # 逐行：a dx^2 + 2b dy dx + e dy^2 - 1 = 0
+    dy = np.arange(max(math.ceil(cy - hy),wy0),min(math.floor(cy + hy),wy1) + 1) - cy
+    disc = dy * dy * det + a
+    root = np.sqrt(np.maximum(disc,0))
+    row_dx = np.concatenate([(-b * dy - root) / a,(-b * dy + root) / a])
+    row_dy = np.concatenate([dy,dy])
+    # 相切的行上梯度与行垂直，总会被归到逐列部分，半径不到一个像素时逐列部分也没有交点，因此两部分都保留切点
+    tangent = np.tile(disc <= ELLIPSE_TANGENT * a,2)
+    steep = tangent | (np.abs(a * row_dx + b * row_dy) >= ELLIPSE_OVERLAP * np.abs(b * row_dx + e * row_dy))
+    # 逐列：e dy^2 + 2b dx dy + a dx^2 - 1 = 0
+    dx = np.arange(max(math.ceil(cx - hx),wx0),min(math.floor(cx + hx),wx1) + 1) - cx
+    disc = dx * dx * det + e
+    root = np.sqrt(np.maximum(disc,0))
+    col_dy = np.concatenate([(-b * dx - root) / e,(-b * dx + root) / e])
+    col_dx = np.concatenate([dx,dx])
+    tangent = np.tile(disc <= ELLIPSE_TANGENT * e,2)
+    flat = tangent | (np.abs(b * col_dx + e * col_dy) >= ELLIPSE_OVERLAP * np.abs(a * col_dx + b * col_dy))
+    xs = np.floor(np.concatenate([row_dx[steep],col_dx[flat]]) + cx + 0.5).astype(np.int64)
+    ys = np.floor(np.concatenate([row_dy[steep],col_dy[flat]]) + cy + 0.5).astype(np.int64)
+    if len(xs) == 0:
+        return np.empty((0,2),dtype=np.int64)
+    # 对称点和两部分交界处会重复，编码成一个整数后去重
+    x0,y0 = xs.min(),ys.min()
+    height = int(ys.max() - y0) + 1
+    keys = np.unique((xs - x0) * height + (ys - y0))
+    return np.stack([keys // height + x0,keys % height + y0],axis=1)
+
+def ellipse_axes(p_list:PointList, matrix:np.ndarray|None = None) -> tuple:
+    """由包围框两个顶点和累积的仿射矩阵得到椭圆的中心和两条共轭半径
 
-def draw_ellipse(p_list:List[Point],alg:str) -> List[Point]:
-    """绘制椭圆（采用中点圆生成算法）
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 变换前椭圆的矩形包围框的两个顶点
+    :param matrix: (3x3 array of float) 仿射矩阵，为None时不变换
+    :return: (center, axes) 中心的形状为(2,)，axes的两列为共轭半径
+    """
+    pts = as_point_list(p_list).array[:2].astype(np.float64)
+    center = (pts[0] + pts[1]) / 2
+    axes = np.diag(np.abs(pts[1] - pts[0]) / 2)
+    if matrix is not None:
+        center = matrix[:2, :2] @ center + matrix[:2, 2]
+        axes = matrix[:2, :2] @ axes
+    return center,axes
+
+def draw_ellipse(p_list:PointList,alg:str,window:tuple|None = None,angle:float = 0.0) -> PointList:
+    """绘制椭圆
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 椭圆的矩形包围框左上角和右下角顶点坐标
+    :param angle: (float) 椭圆绕中心顺时针旋转的弧度
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
     """
-    p0,p1 = p_list[0].copy(),p_list[1].copy()
-    if p0.x > p1.x:
-        p0.x,p1.x = p1.x,p0.x
-    if p0.y > p1.y:
-        p0.y,p1.y = p1.y,p0.y
-    rx,ry =  (p1.x-p0.x)/ 2, (p1.y-p0.y)/2
-    rx2,ry2 = rx*rx,ry*ry
-    xc,yc =  (p1.x+p0.x)/ 2, (p1.y+p0.y)/2
-    x,y = 0,ry
-    quadrant:List[Point] = [Point(x,y)]
-    p = ry2 - rx2*ry + rx2/4
-    while ry2*x < rx2*y:
-        if p >= 0:
-            y -= 1
-            p += 2*rx2*(1-y)
-        p += ry2*(3+2*x)
-        x += 1
-        quadrant.append(Point(x,y))
-    p = ry2*(x+0.5)*(x+0.5) + rx2*(y-1)*(y-1) - rx2*ry2
-    while y > 0 :
-        if p <= 0:
-            x +=1
-            p += 2*ry2*(1+x)
-        y -= 1
-        p += rx2 * (3-2*y)
-        quadrant.append(Point(x,y))
-    result = [Point(nx*p.x+xc-0.001,ny*p.y+yc-0.001) for p in quadrant for nx in (-1, 1) for ny in (-1, 1)]
-    return result
-
-
-def draw_curve(p_list:List[Point], algorithm:str) -> List[Point]:
+    center,axes = ellipse_axes(p_list)
+    if angle:
+        cos,sin = math.cos(angle),math.sin(angle)
+        axes = np.array([[cos, -sin], [sin, cos]]) @ axes
+    return PointList(rasterize_ellipse(center,axes,window))
+
+
+def fill_polygon(p_list:PointList, window:tuple|None = None) -> np.ndarray:
+    """扫描线填充多边形（奇偶规则）
+
+    边表中每条边覆盖扫描线 [y_min, y_max)，水平边不参与。所有边与所有扫描线的交点一次算出，
+    按 (y, x) 排序后即为逐条扫描线的活性边表，同一扫描线上相邻的两个交点构成一段
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :param window: (tuple of int) 可见窗口，给出时只处理窗口内的扫描线，并把线段截到窗口内
+    :return: (array of int) 水平线段 (y, x0, x1)，两端都包含在内，形状为(M,3)
+    """
+    pts = as_point_list(p_list).array.astype(np.float64)
+    if len(pts) < 3:
+        return np.empty((0,3),dtype=np.int64)
+    p0,p1 = pts,np.roll(pts,-1,axis=0)
+    low = p0[:, 1] <= p1[:, 1]
+    lo,hi = np.where(low[:,None],p0,p1),np.where(low[:,None],p1,p0)
+    first,last = np.ceil(lo[:, 1]),np.ceil(hi[:, 1])
+    if window is not None:
+        _,y_min,_,y_max = _expand(window)
+        first,last = np.maximum(first,y_min),np.minimum(last,y_max + 1)
+    edges = np.nonzero(last > first)[0]
+    count = (last - first)[edges].astype(np.int64)
+    lo,hi,first = lo[edges],hi[edges],first[edges]
+    slope = (hi[:, 0] - lo[:, 0]) / (hi[:, 1] - lo[:, 1])
+    edge = np.repeat(np.arange(len(edges)),count)
+    y = first[edge] + (np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count,count))
+    x = lo[edge, 0] + (y - lo[edge, 1]) * slope[edge]
+    order = np.lexsort((x,y))
+    y,x = y[order],x[order]
+    # 闭合多边形与每条扫描线的交点数都是偶数，因此可以整体两两配对
+    spans = np.stack([y[0::2],np.ceil(x[0::2]),np.floor(x[1::2])],axis=1).astype(np.int64)
+    return _clip_spans(spans,window)
+
+def _clip_spans(spans:np.ndarray, window:tuple|None) -> np.ndarray:
+    """把水平线段截到窗口附近，并去掉空的线段"""
+    if window is not None:
+        x_min,_,x_max,_ = _expand(window)
+        spans[:, 1],spans[:, 2] = np.maximum(spans[:, 1],x_min),np.minimum(spans[:, 2],x_max)
+    return spans[spans[:, 1] <= spans[:, 2]]
+
+def fill_ellipse(center:np.ndarray, axes:np.ndarray, window:tuple|None = None) -> np.ndarray:
+    """扫描线填充椭圆，参数与rasterize_ellipse相同
+
+    :return: (array of int) 水平线段 (y, x0, x1)，两端都包含在内，形状为(M,3)
+    """
+    if np.linalg.svd(axes,compute_uv=False)[1] < 1e-9:
+        return np.empty((0,3),dtype=np.int64)
+    cx,cy = center
+    a,b,e,det,_,hy = _conic(axes)
+    y_min,y_max = math.ceil(cy - hy),math.floor(cy + hy)
+    if window is not None:
+        _,wy0,_,wy1 = _expand(window)
+        y_min,y_max = max(y_min,wy0),min(y_max,wy1)
+    y = np.arange(y_min,y_max + 1)
+    dy = y - cy
+    root = np.sqrt(np.maximum(dy * dy * det + a,0))
+    spans = np.stack([y,np.ceil(cx + (-b * dy - root) / a),np.floor(cx + (-b * dy + root) / a)],axis=1).astype(np.int64)
+    return _clip_spans(spans,window)
+
+def spans_to_pixels(spans:np.ndarray) -> np.ndarray:
+    """把水平线段展开为像素点坐标，形状为(N,2)"""
+    length = spans[:, 2] - spans[:, 1] + 1
+    start = np.repeat(np.cumsum(length) - length,length)
+    xs = np.repeat(spans[:, 1],length) + np.arange(int(length.sum())) - start
+    return np.stack([xs,np.repeat(spans[:, 0],length)],axis=1)
+
+
+BEZIER_TOLERANCE = 0.5    # 自适应细分时折线与Bezier曲线之间允许的最大像素误差
+BEZIER_MAX_DEPTH = 16     # 自适应细分的最大深度
+BEZIER_SPLIT_MAX = 32     # 控制点超过该数目时分割矩阵过大，改为在参数空间中二分细化
+BEZIER_SAMPLE_SPACING = 4 # 参数空间细化的初始采样密度：控制多边形每这么多像素一个采样点
+BEZIER_MIN_STEP = 1 / 256  # 初始采样的最小参数步长，更细的部分由二分细化补足
+CURVE_STEP = 0.001        # 按固定步长采样曲线时的参数步长
+BERNSTEIN_MAX_DEGREE = 512  # 超过该次数时二项式系数和幂次会溢出，Bernstein基函数改在对数空间中计算
+
+# 以下各表只与次数和采样步长有关，按参数缓存，返回只读数组，同一条曲线每次重绘只剩矩阵乘法
+
+@lru_cache(maxsize=16)
+def curve_params(du:float = CURVE_STEP) -> np.ndarray:
+    """[0, 1]上的采样参数，与 u += du 逐步累加得到的参数保持一致，形状为(S,)"""
+    u = np.add.accumulate(np.r_[0.0, np.full(int(1 / du) + 1, du)])
+    u = u[u <= 1]
+    u.setflags(write=False)
+    return u
+
+def _bernstein_log(degree:int, u:np.ndarray) -> np.ndarray:
+    """在对数空间中计算Bernstein基函数，不会溢出，且只需一次exp，比逐项求幂快"""
+    k = np.arange(degree + 1)
+    log_fact = np.array([math.lgamma(i + 1) for i in range(degree + 1)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 0 * log(0) 按 0 计，即 u^0 = 1
+        log_u = np.where(k == 0, 0, k * np.log(u))
+        log_v = np.where(k == degree, 0, (degree - k) * np.log(1 - u))
+    return np.exp(log_fact[degree] - log_fact - log_fact[::-1] + log_u + log_v)
+
+def bernstein_weights(degree:int, u:np.ndarray) -> np.ndarray:
+    """Bernstein基函数在参数u处的值
+
+    :param u: (array of float) 参数，形状为(S,1)
+    :return: (array of float) 形状为(S,degree+1)，与控制点(degree+1,2)相乘即得曲线上的点
+    """
+    if degree > BERNSTEIN_MAX_DEGREE:
+        return _bernstein_log(degree, u)
+    k = np.arange(degree + 1)
+    binom = np.array([math.comb(degree, i) for i in range(degree + 1)], dtype=np.float64)
+    return binom * u ** k * (1 - u) ** (degree - k)
+
+@lru_cache(maxsize=64)
+def bernstein_basis(degree:int, du:float = CURVE_STEP) -> np.ndarray:
+    """Bernstein基函数在各采样参数处的值，形状为(S,degree+1)"""
+    basis = bernstein_weights(degree, curve_params(du)[:, None])
+    basis.setflags(write=False)
+    return basis
+
+@lru_cache(maxsize=16)
+def bspline_basis(du:float = CURVE_STEP) -> np.ndarray:
+    """三次均匀B样条一段曲线的4个基函数在各采样参数处的值，形状为(S,4)"""
+    u = curve_params(du)
+    basis = np.stack([(-u**3+3*u**2-3*u+1)/6, (3*u**3-6*u**2+4)/6, (-3*u**3+3*u**2+3*u+1)/6, (u**3)/6], axis=1)
+    basis.setflags(write=False)
+    return basis
+
+def bspline_segments(pts:np.ndarray, du:float = CURVE_STEP) -> np.ndarray:
+    """三次均匀B样条每一段的采样点，所有段一次矩阵乘法求出
+
+    :param pts: (array of float) 控制点，形状为(n,2)，n > 3
+    :return: (array of float) 形状为(S,n-3,2)，按参数和段排列
+    """
+    n = len(pts)
+    # 第k行是各段的第k个控制点，(S,4)的基函数表乘以(4,段数*2)的矩阵即得所有段的采样点
+    windows = np.stack([pts[k:n - 3 + k] for k in range(4)]).reshape(4, -1)
+    return (bspline_basis(du) @ windows).reshape(-1, n - 3, 2)
+
+@lru_cache(maxsize=64)
+def bezier_split_matrices(n:int) -> tuple:
+    """de Casteljau算法在u=0.5处分割n个控制点的Bezier曲线对应的矩阵，左右两段的控制点分别是它们与原控制点的乘积"""
+    left,right = np.zeros((n, n)),np.zeros((n, n))
+    level = np.eye(n)
+    for i in range(n):
+        left[i],right[n - 1 - i] = level[0],level[-1]
+        level = (level[:-1] + level[1:]) / 2
+    left.setflags(write=False)
+    right.setflags(write=False)
+    return left,right
+
+def _bezier_split(ctrl:np.ndarray) -> tuple:
+    """在u=0.5处把一批Bezier曲线各自分成两段
+
+    :param ctrl: (array of float) 控制点，形状为(K,n,2)
+    :return: 左右两段的控制点，形状均为(K,n,2)
+    """
+    left,right = bezier_split_matrices(ctrl.shape[1])
+    return left @ ctrl,right @ ctrl
+
+def _bezier_flat(ctrl:np.ndarray, tolerance:float) -> np.ndarray:
+    """判断每段曲线的控制点到首末端点连线段的距离是否都不超过tolerance"""
+    p0,p1 = ctrl[:, :1],ctrl[:, -1:]
+    d = p1 - p0
+    length2 = np.sum(d * d, axis=2)
+    inner = ctrl[:, 1:-1] - p0
+    t = np.clip(np.sum(inner * d, axis=2) / np.where(length2 == 0, 1, length2), 0, 1)
+    offset = inner - t[:, :, None] * d
+    return np.max(np.sum(offset * offset, axis=2), axis=1, initial=0) <= tolerance * tolerance
+
+def _bezier_sampled(ctrl:np.ndarray, tolerance:float) -> np.ndarray:
+    """在参数空间中二分细化Bezier曲线，每次只对未达到精度的参数区间求中点，每个点的代价与控制点数成正比
+
+    初始按缓存的Bernstein表均匀采样，密度由控制多边形的长度决定；参数中点到弦中点的距离超过tolerance的区间一分为二
+    """
+    length = float(np.sum(np.hypot(*np.diff(ctrl, axis=0).T)))
+    du = 2.0 ** -min(max(math.ceil(math.log2(max(length / BEZIER_SAMPLE_SPACING, 1))), 4), round(-math.log2(BEZIER_MIN_STEP)))
+    degree = len(ctrl) - 1
+    u = curve_params(du)
+    pts = bernstein_basis(degree, du) @ ctrl
+    todo = np.ones(len(u) - 1, dtype=bool)
+    for _ in range(BEZIER_MAX_DEPTH):
+        idx = np.flatnonzero(todo)
+        if len(idx) == 0:
+            break
+        mid_u = (u[idx] + u[idx + 1]) / 2
+        mid = _bernstein_log(degree, mid_u[:, None]) @ ctrl
+        offset = mid - (pts[idx] + pts[idx + 1]) / 2
+        split = np.sum(offset * offset, axis=1) > tolerance * tolerance
+        # 新的中点插在所在区间的右端点之前，被分割的区间变成两个待检查的区间
+        flags = np.zeros(len(todo), dtype=bool)
+        flags[idx[split]] = True
+        u = np.insert(u, idx[split] + 1, mid_u[split])
+        pts = np.insert(pts, idx[split] + 1, mid[split], axis=0)
+        todo = np.repeat(flags, np.where(flags, 2, 1))
+    return pts
+
+def flatten_bezier(p_list:PointList, tolerance:float = BEZIER_TOLERANCE) -> np.ndarray:
+    """自适应细分Bezier曲线，直到每一段与其弦的距离不超过tolerance
+
+    控制点较多时不再用分割矩阵逐段细分，改为在参数空间中二分，见_bezier_sampled
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 曲线的控制点坐标列表
+    :param tolerance: (float) 允许的最大像素误差
+    :return: (array of float: [[x_0, y_0], [x_1, y_1], ...]) 折线顶点，首末点即曲线的首末控制点
+    """
+    ctrl = as_point_list(p_list).array.astype(np.float64)
+    if len(ctrl) > BEZIER_SPLIT_MAX:
+        return _bezier_sampled(ctrl, tolerance)
+    pieces = ctrl[None]
+    done = np.zeros(1, dtype=bool)
+    for _ in range(BEZIER_MAX_DEPTH):
+        done |= _bezier_flat(pieces, tolerance)
+        if done.all():
+            break
+        # 未达到精度的段原地替换为左右两段，保持各段在曲线上的顺序
+        count = np.where(done, 1, 2)
+        start = np.cumsum(count) - count
+        left,right = _bezier_split(pieces[~done])
+        split = np.empty((int(count.sum()),) + pieces.shape[1:])
+        split[start[done]] = pieces[done]
+        split[start[~done]],split[start[~done] + 1] = left,right
+        flags = np.ones(len(split), dtype=bool)
+        flags[start[~done]] = flags[start[~done] + 1] = False
+        pieces,done = split,flags
+    return np.concatenate([pieces[:, 0], pieces[-1:, -1]])
+
+def draw_curve(p_list:PointList, algorithm:str, window:tuple|None = None, tolerance:float = BEZIER_TOLERANCE) -> PointList:
     """绘制曲线
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 曲线的控制点坐标列表
     :param algorithm: (string) 绘制使用的算法，包括'Bezier'和'B-spline'（三次均匀B样条曲线，曲线不必经过首末控制点）
+    :param tolerance: (float) Bezier曲线自适应细分的像素误差，为0时按固定步长采样
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
     """
-    u,du = 0,0.001
-    n = len(p_list)
-    res:List[Point] = []
+    pts = as_point_list(p_list).array.astype(np.float64)
+    n = len(pts)
+    if algorithm == 'Bezier' and n > 0 and tolerance > 0:
+        vertices = np.trunc(flatten_bezier(p_list, tolerance) + 0.5).astype(np.int64)
+        if len(vertices) > 1:
+            keep = np.r_[True, np.any(vertices[1:] != vertices[:-1], axis=1)]
+            vertices = vertices[keep]
+        if len(vertices) == 1:
+            return PointList(vertices)
+        return PointList(rasterize_lines(np.hstack([vertices[:-1], vertices[1:]]), 'Bresenham', window))
     if algorithm == 'Bezier':
-        while u <= 1:
-            p_copy = [PointF(p.x,p.y) for p in p_list]
-            for i in range(n):
-                for j in range(n-1-i):
-                    p0,p1 = p_copy[j],p_copy[j+1]
-                    p_copy[j] = PointF((1-u)*p0.x + u*p1.x, (1-u)*p0.y + u*p1.y)
-            res.append(Point(int(p_copy[0].x+0.5),int(p_copy[0].y+0.5)))
-            u += du
-    else:
-        def b_spline3_vector(u:float) -> List[float]:
-            temp = [(-u**3+3*u**2-3*u+1)/6, (3*u**3-6*u**2+4)/6, (-3*u**3+3*u**2+3*u+1)/6, (u**3)/6]
-            return temp
-
-        def b_spline3_mul(mat:List[float],p_list:List[Point]) -> Point:
-            x,y = 0,0
-            for i in range(4):
-                x += p_list[i].x * mat[i]
-                y += p_list[i].y * mat[i]
-            return Point(x,y)
-        if n <= 3:
-            return []
-        while u <= 1:
-            vector = b_spline3_vector(u)
-            for i in range(n-3):
-                res.append(b_spline3_mul(vector,p_list[i:i+4]))
-            u += du
-    return res
-
-def draw_freenom(p_list:List[Point],alg):
-    return p_list
-
-def translate(p_list:List[Point], dx:int|str, dy:int|str) -> List[Point]:
+        if n == 0:
+            return PointList()
+        return PointList(_in_window(np.trunc(bernstein_basis(n - 1) @ pts + 0.5), window))
+    if n <= 3:
+        return PointList()
+    return PointList(_in_window(bspline_segments(pts).reshape(-1, 2), window))
+
+FREENOM_TOLERANCE = 1.0   # 自由绘制时简化笔迹允许的最大像素误差
+FREENOM_WINDOW = 256      # 一个保留点最多代替的采样点数
+
+class StrokeSimplifier:
+    """
+    自由绘制笔迹的在线简化。末尾的点总是最新的采样点，若从上一个保留点到新采样点的线段
+    与期间所有采样点的距离都不超过tolerance，就直接移动末尾的点，否则保留末尾的点再追加新点
+    """
+    def __init__(self,tolerance:float = FREENOM_TOLERANCE) -> None:
+        self.tolerance = tolerance
+        self.skipped:list = []   # 上一个保留点之后被末尾点代替的采样点
+
+    def add(self,p_list:PointList,p:Point) -> None:
+        """把采样点p加入笔迹p_list，p_list至少包含起点和末尾点两个点"""
+        tail = p_list[-1]
+        if tail.equal(p):
+            return
+        samples = np.array(self.skipped + [(tail.x,tail.y)],dtype=np.float64)
+        anchor = p_list[-2]
+        a = np.array([anchor.x,anchor.y],dtype=np.float64)
+        d = np.array([p.x - anchor.x,p.y - anchor.y],dtype=np.float64)
+        offset = samples - a
+        t = np.clip(offset @ d / max(d @ d,1e-12),0,1)
+        dist2 = np.sum((offset - t[:,None] * d) ** 2,axis=1)
+        if len(self.skipped) < FREENOM_WINDOW and dist2.max() <= self.tolerance * self.tolerance:
+            self.skipped.append((tail.x,tail.y))
+            p_list[-1] = p
+        else:
+            self.skipped = []
+            p_list.append(p)
+
+def draw_freenom(p_list:PointList,alg,window:tuple|None = None) -> PointList:
+    """绘制自由笔迹，相邻采样点之间用Bresenham直线连接
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 笔迹的采样点
+    :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
+    """
+    pts = as_point_list(p_list).array
+    if len(pts) < 2:
+        return PointList(pts)
+    return PointList(rasterize_lines(np.hstack([pts[:-1],pts[1:]]),'Bresenham',window))
+
+def translate(p_list:PointList, dx:int|str, dy:int|str) -> PointList:
     """平移变换
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 图元参数
@@ -174,11 +573,11 @@ def translate(p_list:List[Point], dx:int|str, dy:int|str) -> List[Point]:
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 变换后的图元参数
     """
     dx,dy = int(dx),int(dy)
-    return [Point(p.x + dx, p.y + dy) for p in p_list]
+    return PointList(as_point_list(p_list).array + (dx, dy))
 
 
-def rotate(p_list:List[Point], x:int|str, y:int|str, r:float|str,flag:bool = False) -> List[Point]:
-    """旋转变换（除椭圆外）
+def rotate(p_list:PointList, x:int|str, y:int|str, r:float|str,flag:bool = False) -> PointList:
+    """旋转变换（椭圆的两个控制点无法表示旋转，应使用rotate_matrix累积到图元的变换矩阵中）
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 图元参数
     :param x: (int) 旋转中心x坐标
@@ -191,10 +590,11 @@ def rotate(p_list:List[Point], x:int|str, y:int|str, r:float|str,flag:bool = Fal
     theta = r if flag else (r / 360 * 2 * math.pi)
     cos = math.cos(theta)
     sin = math.sin(theta)
-    return [Point((p.x-x)*cos-(p.y-y)*sin+x,(p.x-x)*sin+(p.y-y)*cos+y) for p in p_list]
+    px,py = as_point_list(p_list).array.T
+    return PointList(np.stack([(px-x)*cos-(py-y)*sin+x,(px-x)*sin+(py-y)*cos+y],axis=1))
 
 
-def scale(p_list:List[Point], x:int|str, y:int|str, s:float|str,sy:float|str = 0) -> List[Point]:
+def scale(p_list:PointList, x:int|str, y:int|str, s:float|str,sy:float|str = 0) -> PointList:
     """缩放变换
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 图元参数
@@ -205,10 +605,117 @@ def scale(p_list:List[Point], x:int|str, y:int|str, s:float|str,sy:float|str = 0
     """
     x,y,s,sy = int(x),int(y),float(s),float(sy)
     sy = s if sy == 0 else sy
-    return [ Point((p.x-x)*s + x, (p.y - y)*sy + y) for p in p_list ]
+    px,py = as_point_list(p_list).array.T
+    return PointList(np.stack([(px-x)*s + x, (py - y)*sy + y],axis=1))
+
+
+CS_LEFT,CS_RIGHT,CS_BOTTOM,CS_TOP = 1,2,4,8  # Cohen-Sutherland区域编码
+
+def _normalize_window(window) -> tuple:
+    x_min,y_min,x_max,y_max = window
+    return min(x_min,x_max),min(y_min,y_max),max(x_min,x_max),max(y_min,y_max)
+
+def _encode(x:np.ndarray, y:np.ndarray, window:tuple) -> np.ndarray:
+    x_min,y_min,x_max,y_max = window
+    return ((x < x_min) * CS_LEFT) | ((x > x_max) * CS_RIGHT) | ((y < y_min) * CS_BOTTOM) | ((y > y_max) * CS_TOP)
+
+def _clip_params(segments:np.ndarray, window:tuple) -> tuple:
+    """Liang-Barsky算法求每条线段在窗口内的参数范围
+
+    :return: (rn1, rn2, keep) 线段上 rn1 <= t <= rn2 的部分在窗口内，keep为False的线段完全在窗口外
+    """
+    x0,y0,x1,y1 = np.asarray(segments,dtype=np.float64).reshape(-1,4).T
+    x_min,y_min,x_max,y_max = window
+    p = np.stack([x0 - x1,x1 - x0,y0 - y1,y1 - y0])
+    q = np.stack([x0 - x_min,x_max - x0,y0 - y_min,y_max - y0])
+    with np.errstate(divide='ignore',invalid='ignore'):
+        r = q / p
+    keep = ~np.any((p == 0) & (q < 0),axis=0)
+    rn1 = np.max(np.where(p < 0,r,0),axis=0,initial=0)
+    rn2 = np.min(np.where(p > 0,r,1),axis=0,initial=1)
+    keep &= rn1 <= rn2
+    return rn1,rn2,keep
 
+def clip_lines(segments, window:tuple, algorithm:str) -> tuple:
+    """批量裁剪线段，所有线段一起逐步处理，结果与逐条调用clip一致
+
+    :param segments: (array of int) 线段 (x0, y0, x1, y1)，形状为(N,4)
+    :param window: (tuple of int) 裁剪窗口 (x_min, y_min, x_max, y_max)
+    :param algorithm: (string) 使用的裁剪算法，包括'Cohen-Sutherland'和'Liang-Barsky'
+    :return: (裁剪后的线段, 是否保留)，形状分别为(N,4)和(N,)，被裁掉的线段对应的行没有意义。
+             Cohen-Sutherland得到的线段可能首尾互换，与clip一致
+    """
+    seg = np.asarray(segments,dtype=np.float64).reshape(-1,4)
+    window = _normalize_window(window)
+    x_min,y_min,x_max,y_max = window
+    x0,y0,x1,y1 = (seg[:, i].copy() for i in range(4))
+    if algorithm == 'Cohen-Sutherland':
+        keep = np.zeros(len(seg),dtype=bool)
+        active = np.ones(len(seg),dtype=bool)
+        while True:
+            code0,code1 = _encode(x0,y0,window),_encode(x1,y1,window)
+            active &= (code0 & code1) == 0
+            inside = active & ((code0 | code1) == 0)
+            keep |= inside
+            active &= ~inside
+            if not active.any():
+                break
+            # 总是移动窗口外的端点p0
+            swap = active & (code0 == 0)
+            x0,x1 = np.where(swap,x1,x0),np.where(swap,x0,x1)
+            y0,y1 = np.where(swap,y1,y0),np.where(swap,y0,y1)
+            code = np.where(swap,code1,code0)
+            lr = active & ((code & (CS_LEFT | CS_RIGHT)) != 0)
+            tb = active & ~lr & ((code & (CS_TOP | CS_BOTTOM)) != 0)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                x = np.where(code & CS_LEFT,x_min,x_max)
+                y = np.round((y0 - y1) / (x0 - x1) * (x - x0) + y0)
+                x0,y0 = np.where(lr,x,x0),np.where(lr,y,y0)
+                y = np.where(code & CS_TOP,y_max,y_min)
+                x = np.trunc((y - y0) * ((x0 - x1) / (y0 - y1)) + x0)
+                x0,y0 = np.where(tb,x,x0),np.where(tb,y,y0)
+        return np.stack([x0,y0,x1,y1],axis=1),keep
+    rn1,rn2,keep = _clip_params(seg,window)
+    return np.stack([x0 + (x1 - x0) * rn1,y0 + (y1 - y0) * rn1,x0 + (x1 - x0) * rn2,y0 + (y1 - y0) * rn2],axis=1),keep
+
+def _clip_segment(x0:float, y0:float, x1:float, y1:float, window:tuple, algorithm:str) -> tuple|None:
+    """裁剪单条线段，逐步计算与clip_lines完全相同，省去数组运算的开销
+
+    :param window: (tuple of int) 规范化后的裁剪窗口
+    :return: 裁剪后的线段 (x0, y0, x1, y1)，完全在窗口外时为None
+    """
+    x_min,y_min,x_max,y_max = window
+    if algorithm == 'Cohen-Sutherland':
+        while True:
+            code0,code1 = _encode(x0,y0,window),_encode(x1,y1,window)
+            if code0 & code1:
+                return None
+            if not code0 | code1:
+                return x0,y0,x1,y1
+            if code0 == 0:
+                x0,y0,x1,y1,code0 = x1,y1,x0,y0,code1
+            if code0 & (CS_LEFT | CS_RIGHT):
+                x = x_min if code0 & CS_LEFT else x_max
+                x0,y0 = x,round((y0 - y1) / (x0 - x1) * (x - x0) + y0)
+            else:
+                y = y_max if code0 & CS_TOP else y_min
+                x0,y0 = math.trunc((y - y0) * ((x0 - x1) / (y0 - y1)) + x0),y
+    p = (x0 - x1,x1 - x0,y0 - y1,y1 - y0)
+    q = (x0 - x_min,x_max - x0,y0 - y_min,y_max - y0)
+    rn1,rn2 = 0,1
+    for p_i,q_i in zip(p,q):
+        if p_i == 0:
+            if q_i < 0:
+                return None
+        elif p_i < 0:
+            rn1 = max(rn1,q_i / p_i)
+        else:
+            rn2 = min(rn2,q_i / p_i)
+    if rn1 > rn2:
+        return None
+    return x0 + (x1 - x0) * rn1,y0 + (y1 - y0) * rn1,x0 + (x1 - x0) * rn2,y0 + (y1 - y0) * rn2
 
-def clip(p_list:List[Point],x_min:int|str,y_min:int|str,x_max:int|str,y_max:int|str,alg:str) -> List[Point]:
+def clip(p_list:PointList,x_min:int|str,y_min:int|str,x_max:int|str,y_max:int|str,alg:str) -> PointList:
     """线段裁剪
 
     :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 线段的起点和终点坐标
@@ -219,88 +726,137 @@ def clip(p_list:List[Point],x_min:int|str,y_min:int|str,x_max:int|str,y_max:int|
     :param algorithm: (string) 使用的裁剪算法，包括'Cohen-Sutherland'和'Liang-Barsky'
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1]]) 裁剪后线段的起点和终点坐标
     """
-    x_min,y_min,x_max,y_max = int(x_min),int(y_min),int(x_max),int(y_max)
-    p0,p1 = p_list[0].copy(),p_list[1].copy()
-    if x_min > x_max:
-        x_max, x_min = x_min, x_max
-    if y_min > y_max:
-        y_max, y_min = y_min, y_max
-    if alg == 'Cohen-Sutherland':
-        LEFT,RIGHT,BOTTOM,TOP = 1,2,4,8
-        LR,TB = LEFT+RIGHT,TOP+BOTTOM
-        def encode(x, y):
-            ret = 0
-            ret |= (LEFT if x < x_min else 0)
-            ret |= (RIGHT if x > x_max else 0)
-            ret |= (BOTTOM if y < y_min else 0)
-            ret |= (TOP if y > y_max else 0)
-            return ret
-        while True:
-            code0,code1 = encode(p0.x,p0.y),encode(p1.x,p1.y)
-            if (code0&code1)!=0:
-                return []
-            if (code0|code1)==0:
-                return [p0,p1]
-            if code0 == 0:
-                p0,p1 = p1,p0
-            code = encode(p0.x,p0.y)
-            x,y = p0.x,p0.y
-            if code & LR:
-                x = x_min if code & LEFT else x_max
-                y = round(p0.slope(p1) *(x - p0.x) + p0.y)
-            elif code & TB:
-                y = y_max if code & TOP else y_min
-                x = (y-p0.y) * p0.slope_y(p1) + p0.x
-            p0.x,p0.y = int(x),int(y)
-    else:
-        p = [p0.x - p1.x, p1.x - p0.x, p0.y - p1.y, p1.y - p0.y]
-        q = [p0.x - x_min, x_max - p0.x, p0.y - y_min, y_max - p0.y]
-        rn1,rn2 = 0,1
-        for i in range(0,4):
-            if p[i] == 0: 
-                if q[i] < 0:
-                    return []
-            elif p[i] < 0:
-                rn1 = max(rn1,q[i]/p[i])
-            else:
-                rn2 = min(rn2,q[i]/p[i])
-        if rn1 > rn2:
-            return []
-        return [Point(p0.x+(p1.x-p0.x)*rn1,p0.y+(p1.y-p0.y)*rn1),Point(p0.x+(p1.x-p0.x)*rn2,p0.y+(p1.y-p0.y)*rn2)]
+    window = _normalize_window((int(x_min),int(y_min),int(x_max),int(y_max)))
+    seg = _clip_segment(*as_point_list(p_list).array[:2].ravel().tolist(),window,alg)
+    return PointList(np.array(seg).reshape(2,2)) if seg is not None else PointList()
 
-DRAW_TYPE = Callable[[List[Point],str],List[Point]]
+def clip_polygon(p_list:PointList, window:tuple) -> PointList:
+    """Sutherland-Hodgman多边形裁剪，依次用窗口的四条边界裁剪，每条边界对所有边一次处理
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :param window: (tuple of int) 裁剪窗口 (x_min, y_min, x_max, y_max)
+    :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 裁剪后多边形的顶点坐标列表，完全在窗口外时为空
+    """
+    pts = as_point_list(p_list).array.astype(np.float64)
+    x_min,y_min,x_max,y_max = _normalize_window(window)
+    for axis,bound,lower in ((0,x_min,True),(0,x_max,False),(1,y_min,True),(1,y_max,False)):
+        if len(pts) == 0:
+            break
+        prev = np.roll(pts,1,axis=0)
+        inside = pts[:, axis] >= bound if lower else pts[:, axis] <= bound
+        cross = inside != np.roll(inside,1)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            t = (bound - prev[:, axis]) / (pts[:, axis] - prev[:, axis])
+            crossing = prev + t[:, None] * (pts - prev)
+        crossing[:, axis] = bound
+        # 每条边依次输出与边界的交点（若穿过边界）和终点（若在内侧）
+        out = np.stack([crossing,pts],axis=1).reshape(-1,2)
+        pts = out[np.stack([cross,inside],axis=1).ravel()]
+    # 顶点落在边界上时会输出重复的点
+    pts = np.rint(pts)
+    return PointList(pts[np.any(pts != np.roll(pts,1,axis=0),axis=1)] if len(pts) > 1 else pts)
+
+CLIP_TYPES = ['line','polygon']  # 裁剪后仍能用原类型表示的图元
+
+def clip_shape(type:str, p_list:PointList, window:tuple, algorithm:str) -> PointList:
+    """按图元类型裁剪控制点，线段用algorithm指定的算法，多边形用Sutherland-Hodgman算法
+
+    :raises ValueError: 图元类型不在CLIP_TYPES中
+    """
+    if type not in CLIP_TYPES:
+        raise ValueError('不能裁剪的图元类型 %s' % type)
+    if type == 'polygon':
+        return clip_polygon(p_list,window)
+    return clip(p_list,*window,algorithm)
+
+DRAW_TYPE = Callable[[PointList,str],PointList]
 DRAW_FUNC:Dict[str,DRAW_TYPE] = {
     'line':draw_line,'polygon':draw_polygon,'ellipse':draw_ellipse,'curve':draw_curve,'rect':draw_rect,
     'freenom':draw_freenom
 }
 
-TRANS_FUNC_TYPE = Callable[[List[Point],Any],List[Point]]
+TRANS_FUNC_TYPE = Callable[[PointList,Any],PointList]
 TRANS_FUNC = {
     'translate':translate,'rotate':rotate,'scale':scale,'clip':clip
 }
 
-def draw(type:str,p_list:List[Point],alg:str) -> List[Point] :
-    return DRAW_FUNC[type](p_list,alg)
+def draw(type:str,p_list:PointList,alg:str,window:tuple|None = None) -> PointList :
+    return DRAW_FUNC[type](p_list,alg,window)
 
-def transform(type:str,args) -> List[Point]:
+def transform(type:str,args) -> PointList:
     return TRANS_FUNC[type](*args)
 
+AFFINE = ['translate','rotate','scale']
+IDENTITY = np.eye(3)
+
+def translate_matrix(dx:float, dy:float) -> np.ndarray:
+    return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]], dtype=np.float64)
+
+def rotate_matrix(x:float, y:float, theta:float) -> np.ndarray:
+    cos,sin = math.cos(theta),math.sin(theta)
+    return np.array([[cos, -sin, x - x*cos + y*sin], [sin, cos, y - x*sin - y*cos], [0, 0, 1]], dtype=np.float64)
+
+def scale_matrix(x:float, y:float, sx:float, sy:float) -> np.ndarray:
+    return np.array([[sx, 0, x - x*sx], [0, sy, y - y*sy], [0, 0, 1]], dtype=np.float64)
+
+def apply_matrix(p_list:PointList, matrix:np.ndarray) -> PointList:
+    """一次性对所有点做仿射变换
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 图元参数
+    :param matrix: (3x3 array of float) 作用于列向量[x, y, 1]的仿射矩阵
+    :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 变换后的图元参数
+    """
+    p_list = as_point_list(p_list)
+    if np.array_equal(matrix, IDENTITY):
+        return p_list
+    return PointList(p_list.array @ matrix[:2, :2].T + matrix[:2, 2])
+
+def draw_transformed(type:str,p_list:PointList,alg:str,matrix:np.ndarray,window:tuple|None = None) -> PointList:
+    """绘制经过仿射变换的图元，椭圆直接按变换后的参数绘制，其余图元先变换控制点"""
+    if type == 'ellipse':
+        return PointList(rasterize_ellipse(*ellipse_axes(p_list,matrix),window))
+    return draw(type,apply_matrix(p_list,matrix),alg,window)
+
+def fill_transformed(type:str,p_list:PointList,matrix:np.ndarray,window:tuple|None = None) -> np.ndarray:
+    """填充经过仿射变换的多边形或椭圆，返回水平线段 (y, x0, x1)"""
+    if type == 'ellipse':
+        return fill_ellipse(*ellipse_axes(p_list,matrix),window)
+    return fill_polygon(apply_matrix(p_list,matrix),window)
+
+def ellipse_bounds(p_list:PointList, matrix:np.ndarray) -> tuple:
+    """经过仿射变换的椭圆的包围盒 (x_min, y_min, x_max, y_max)"""
+    center,axes = ellipse_axes(p_list,matrix)
+    half = np.sqrt(np.sum(axes * axes,axis=1))
+    (x_min,y_min),(x_max,y_max) = np.floor(center - half),np.ceil(center + half)
+    return int(x_min),int(y_min),int(x_max),int(y_max)
+
+def affine_matrix(type:str,args) -> np.ndarray:
+    """与transform参数相同的平移、旋转、缩放对应的仿射矩阵"""
+    if type == 'translate':
+        return translate_matrix(float(args[0]),float(args[1]))
+    x,y = float(args[0]),float(args[1])
+    if type == 'rotate':
+        return rotate_matrix(x,y,float(args[2]) / 360 * 2 * math.pi)
+    s = float(args[2])
+    return scale_matrix(x,y,s,s)
+
 # 变换的参数由点的形式给出
-def p_transform(type:str,origin:List[Point],ctr_p:List[Point],alg:str,undo=False) -> List[Point]:
-    p0,p1 = ctr_p[0:2]
+def p_matrix(type:str,ctr_p:PointList,undo=False) -> np.ndarray:
+    """由控制点得到平移、旋转、缩放对应的仿射矩阵，undo为True时得到其逆变换"""
+    p0,p1 = ctr_p[0],ctr_p[1]
     if type == 'translate':
         dx,dy = p1.x - p0.x,p1.y - p0.y
         if undo:
             dx,dy = -dx,-dy
-        return translate(origin,dx,dy)
+        return translate_matrix(dx,dy)
     elif type == 'rotate':
         if p0.equal(p1):
-            return origin
+            return IDENTITY
         theta = math.pi/2 if p1.x == p0.x else math.atan(p0.slope(p1))
         theta = theta if p1.x > p0.x else theta + math.pi
         theta = 2 * math.pi - theta if undo else theta
-        return rotate(origin,p0.x,p0.y,theta,True)
-    elif type == 'scale':
+        return rotate_matrix(p0.x,p0.y,theta)
+    else:
         # if undo:
         #     return ctr_p
         # x_min,y_min = origin[0].x,origin[0].y
@@ -314,8 +870,12 @@ def p_transform(type:str,origin:List[Point],ctr_p:List[Point],alg:str,undo=False
         sy = abs((p1.y - p0.y) /50) if p0.y != p1.y else 1
         if undo:
             sx,sy = 1/sx,1/sy
-        return scale(origin,p0.x,p0.y,sx,sy)
-    else:
-        if undo:
-            return ctr_p
-        return clip(origin,p0.x,p0.y,p1.x,p1.y,alg)
+        return scale_matrix(p0.x,p0.y,sx,sy)
+
+def p_transform(type:str,origin:PointList,ctr_p:PointList,alg:str,undo=False) -> PointList:
+    if type in AFFINE:
+        return apply_matrix(origin,p_matrix(type,ctr_p,undo))
+    if undo:
+        return as_point_list(ctr_p)
+    p0,p1 = ctr_p[0],ctr_p[1]
+    return clip(origin,p0.x,p0.y,p1.x,p1.y,alg)
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+import algorithms as alg
+from utils import PointList
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),'bench_baseline.json')
+THRESHOLD = 0.5  # 比基线慢超过该比例即视为性能回退，单次测量在共享机器上的波动可达30%
+SEED = 20240601
+
+CASE = Tuple[str,str,int,Callable[[],object]]  # (函数名, 算法, 输入规模, 无参调用)
+
+def _points(n:int, rng:np.random.Generator) -> PointList:
+    return PointList(rng.integers(0,2000,size=(n,2)))
+
+def _walk(n:int, rng:np.random.Generator) -> PointList:
+    """n个采样点的随机游走，模拟自由笔迹"""
+    return PointList(np.cumsum(rng.integers(-3,4,size=(n,2)),axis=0) + 1000)
+
+def _regular(n:int, radius:int = 500) -> PointList:
+    theta = np.linspace(0,2 * np.pi,n,endpoint=False)
+    return PointList(np.rint(np.stack([np.cos(theta),np.sin(theta)],axis=1) * radius + 1000))
+
+def cases(quick:bool = False) -> Iterator[CASE]:
+    """每个DRAW_FUNC和TRANS_FUNC中的函数、每种算法、一组输入规模组合成的测试用例，输入由固定种子生成
+
+    :param quick: 为True时每个函数只取较小的几个规模
+    """
+    rng = np.random.default_rng(SEED)
+    lengths = [10,100,1000,10000]
+    counts = [4,64,1024,16384]
+    if quick:
+        lengths,counts = lengths[:3],counts[:3]
+    draw = alg.DRAW_FUNC
+    for a in ['Naive','DDA','Bresenham']:
+        for n in lengths:
+            p_list = PointList([[0,0],[n,n // 3]])
+            yield 'draw_line',a,n,lambda p_list=p_list,a=a: draw['line'](p_list,a)
+        for n in counts:
+            p_list = _regular(n)
+            yield 'draw_polygon',a,n,lambda p_list=p_list,a=a: draw['polygon'](p_list,a)
+    for n in lengths:
+        p_list = PointList([[0,0],[n,n // 2]])
+        yield 'draw_rect','',n,lambda p_list=p_list: draw['rect'](p_list,'')
+        p_list = PointList([[1000 - n,1000 - n // 2],[1000 + n,1000 + n // 2]])
+        yield 'draw_ellipse','',n,lambda p_list=p_list: draw['ellipse'](p_list,'')
+    # Bezier曲线的次数等于控制点数，规模太大时没有实际意义
+    for a,sizes in [('Bezier',[3,6,12,24]),('B-spline',counts)]:
+        for n in (sizes[:3] if quick else sizes):
+            p_list = _points(n,rng)
+            yield 'draw_curve',a,n,lambda p_list=p_list,a=a: draw['curve'](p_list,a)
+    for n in counts:
+        p_list = _walk(n,rng)
+        yield 'draw_freenom','',n,lambda p_list=p_list: draw['freenom'](p_list,'')
+    trans = alg.TRANS_FUNC
+    for n in counts:
+        p_list = _points(n,rng)
+        yield 'translate','',n,lambda p_list=p_list: trans['translate'](p_list,'10','-20')
+        yield 'rotate','',n,lambda p_list=p_list: trans['rotate'](p_list,'1000','1000','30')
+        yield 'scale','',n,lambda p_list=p_list: trans['scale'](p_list,'1000','1000','0.5')
+    # 单条线段的裁剪与线段长度无关，规模取线段长度只为覆盖穿过、部分在内和完全在外几种情况
+    for a in ['Cohen-Sutherland','Liang-Barsky']:
+        for n in lengths:
+            p_list = PointList([[-n,-n // 2],[n,n]])
+            yield 'clip',a,n,lambda p_list=p_list,a=a: trans['clip'](p_list,'-50','-50','50','50',a)
+
+def measure(func:Callable[[],object], repeat:int, min_time:float) -> Dict[str,float]:
+    """测量一次调用的耗时：先加倍循环次数直到一轮不少于min_time，再重复repeat轮
+
+    :return: 每次调用的最短、中位耗时（秒）和每轮的循环次数
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return {'best':min(times),'median':statistics.median(times),'loops':loops}
+
+def _reference() -> None:
+    """固定的参考负载，用来换算不同机器和负载下的速度
+
+    被测函数大多是对几十到几千个元素的NumPy调用，耗时主要在调用开销上，参考负载也以小数组运算为主
+    """
+    a = np.arange(20000,dtype=np.float64)
+    np.sort(np.sin(a) * a)
+    b = np.arange(64,dtype=np.float64).reshape(32,2)
+    for _ in range(500):
+        c = np.concatenate([b,b[::-1]]) * 0.5
+        np.trunc(c[c[:,0] >= 8] + 0.5).astype(np.int64)
+    sum(i * i for i in range(5000))
+
+def calibrate(repeat:int = 5, min_time:float = 0.02) -> float:
+    return measure(_reference,repeat,min_time)['best']
+
+def scaling(results:Dict[str,dict]) -> Dict[str,float]:
+    """按 函数/算法 分组，拟合log(耗时)与log(规模)的斜率，即耗时随规模增长的阶数"""
+    groups:Dict[str,List[Tuple[int,float]]] = {}
+    for result in results.values():
+        groups.setdefault('%s/%s' % (result['func'],result['algorithm']),[]).append((result['size'],result['best']))
+    slopes = {}
+    for name,points in groups.items():
+        if len(points) >= 2:
+            sizes,times = np.log(np.array(points,dtype=np.float64)).T
+            slopes[name] = round(float(np.polyfit(sizes,times,1)[0]),3)
+    return slopes
+
+def run(pattern:str = '', repeat:int = 5, min_time:float = 0.02, quick:bool = False, verbose:bool = True) -> dict:
+    """运行匹配pattern的测试用例
+
+    :param pattern: 只运行名称（函数/算法/规模）中包含该字符串的用例
+    :return: 可序列化为JSON的结果，results以 函数/算法/规模 为键
+    """
+    results = {}
+    reference = calibrate(repeat,min_time)
+    for func_name,algorithm,size,func in cases(quick):
+        name = '%s/%s/%d' % (func_name,algorithm,size)
+        if pattern not in name:
+            continue
+        result = measure(func,repeat,min_time)
+        result.update(func=func_name,algorithm=algorithm,size=size)
+        results[name] = result
+        if verbose:
+            print('%-40s %12.1f us' % (name,result['best'] * 1e6),file=sys.stderr)
+    return {
+        'meta':{
+            'python':platform.python_version(),'numpy':np.__version__,'machine':platform.machine(),
+            'platform':platform.platform(),'repeat':repeat,'min_time':min_time,'reference':reference
+        },
+        'results':results,
+        'scaling':scaling(results),
+    }
+
+def compare(report:dict, baseline:dict, threshold:float = THRESHOLD, retry:int = 3) -> List[Tuple[str,float,float]]:
+    """本次的最短耗时与基线的中位耗时比较，耗时先按参考负载换算到基线所在机器的速度，
+    基线中偶然偏快的一次测量不会造成误报
+
+    疑似回退的用例连同参考负载一起重新测量retry次取最小值，避免测量期间系统负载的变化造成误报
+
+    :return: 回退的用例 (名称, 基线的中位耗时, 换算后的本次最短耗时)，基线中没有的用例不参与比较
+    """
+    meta = report['meta']
+    funcs = {'%s/%s/%d' % case[:3]:case[3] for case in cases()}
+    regressions = []
+    for name,result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        best = result['best'] * baseline['meta']['reference'] / meta['reference']
+        for _ in range(retry):
+            if best <= base['median'] * (1 + threshold):
+                break
+            reference = calibrate(meta['repeat'],meta['min_time'])
+            elapsed = measure(funcs[name],meta['repeat'],meta['min_time'])['best']
+            best = min(best,elapsed * baseline['meta']['reference'] / reference)
+        if best > base['median'] * (1 + threshold):
+            regressions.append((name,base['median'],best))
+    return regressions
+
+def main(argv:List[str]|None = None) -> int:
+    parser = argparse.ArgumentParser(description='algorithms.py中绘制和变换函数的性能测试')
+    parser.add_argument('-o','--output',help='结果JSON的保存路径，默认输出到标准输出')
+    parser.add_argument('-k',dest='pattern',default='',help='只运行名称中包含该字符串的用例')
+    parser.add_argument('--baseline',default=BASELINE,help='基线结果文件，存在时与之比较')
+    parser.add_argument('--threshold',type=float,default=THRESHOLD,help='允许比基线慢的比例')
+    parser.add_argument('--update-baseline',action='store_true',help='把本次结果写入基线文件')
+    parser.add_argument('--repeat',type=int,default=5,help='每个用例重复测量的轮数')
+    parser.add_argument('--min-time',type=float,default=0.02,help='每轮的最短耗时（秒）')
+    parser.add_argument('--quick',action='store_true',help='只运行较小的输入规模')
+    args = parser.parse_args(argv)
+
+    report = run(args.pattern,args.repeat,args.min_time,args.quick)
+    text = json.dumps(report,indent=2,sort_keys=True)
+    if args.output:
+        with open(args.output,'w') as fp:
+            fp.write(text)
+    else:
+        print(text)
+    if args.update_baseline:
+        with open(args.baseline,'w') as fp:
+            fp.write(text)
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    regressions = compare(report,baseline,args.threshold)
+    for name,base,best in regressions:
+        print('regression: %s %.1f us -> %.1f us (+%.0f%%)' % (name,base * 1e6,best * 1e6,(best / base - 1) * 100),file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
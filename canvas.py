@@ -1,14 +1,18 @@
 from item import ItemDesc
-from utils import Point
+from utils import Point, PointList
 from PyQt5.QtWidgets import (
     QGraphicsView,
     QMessageBox,
     QColorDialog,
 )
-from PyQt5.QtGui import QMouseEvent, QColor
-from PyQt5.QtCore import Qt,pyqtSignal
+from PyQt5.QtGui import QMouseEvent, QColor, QPaintEvent
+from PyQt5.QtCore import pyqtSignal
 from oprecord import OPRecord
+from algorithms import StrokeSimplifier
+from itemlist import ItemListModel
+from tracing import tracer,traced
 
+MAX_VIEW_SIZE = (1500, 900)  # 画布窗口的最大宽度和高度
 
 class MyCanvas(QGraphicsView):
     """
@@ -18,7 +22,8 @@ class MyCanvas(QGraphicsView):
     def __init__(self, *args):
         super().__init__(*args)
         self.main_window = None
-        self.list_widget = None
+        self.list_view = None
+        self.list_model = ItemListModel(self)
         self.tmp_type = 'freenom'
         self.alg = ''
         self.tmp_id = '0'
@@ -26,20 +31,25 @@ class MyCanvas(QGraphicsView):
         self.selected_id = ''
         self.op_record = OPRecord(self)
         self.tmp_desc:ItemDesc|None = None
+        self.stroke = StrokeSimplifier()
+        self.fill = False
 
     def reset(self,h=None,w=None):
-        h = h if h else self.height()
-        w = w if w else self.width()
+        if h and w:
+            self.scene().setSceneRect(0, 0, h, w)
+        rect = self.scene().sceneRect()
         self.clearSelection()
         self.op_record.clear()
-        self.setFixedSize(h, w)
+        self.list_model.clear()
+        # 超出窗口上限的画布通过滚动条浏览，绘制时只光栅化可见部分
+        self.setFixedSize(min(int(rect.width()), MAX_VIEW_SIZE[0]), min(int(rect.height()), MAX_VIEW_SIZE[1]))
         self.tmp_id,self.tmp_desc,self.color = '0',None,QColor(0,0,0)
         self.op_record.view = self
 
     def start(self, type:str,algorithm:str) -> bool:
         if type == 'clip':
             if not self.op_record.canClip(self.selected_id):
-                QMessageBox.warning(self,"type error","只支持线段的裁剪",QMessageBox.Ok)
+                QMessageBox.warning(self,"type error","选中的图元中没有线段或多边形，只支持对线段和多边形的裁剪",QMessageBox.Ok)
                 self.tmp_type = 'freenom'
                 return False
         self.tmp_id = self.main_window.get_id(self.tmp_desc!=None)
@@ -52,22 +62,35 @@ class MyCanvas(QGraphicsView):
         if self.selected_id != '':
             self.op_record.select(self.selected_id,False)
             self.selected_id = ''
-        self.list_widget.clearSelection()
+        self.list_view.clearSelection()
 
     def selectionChanged(self, selected):
+        """
+        :param selected: 选中图元的id，多个图元以ItemDesc.GROUP_SEP连接，之后的变换作为一次操作作用于全部选中的图元
+        """
+        if selected == self.selected_id:
+            return
         self.main_window.statusBar().showMessage('图元选择： %s' % selected)
         if self.selected_id != '':
             self.op_record.select(self.selected_id,False)
+        self.selected_id = selected
         if selected != '':
-            self.selected_id = selected
             self.op_record.select(self.selected_id)
         self.tmp_type = "freenom"
 
+    def setFill(self,fill:bool):
+        self.fill = fill
+
     def setColor(self):
         temp_color = QColorDialog.getColor()
         if temp_color.isValid():
             self.color = temp_color
 
+    @traced('frame')
+    def paintEvent(self, event: QPaintEvent) -> None:
+        super().paintEvent(event)
+        tracer.frame()
+
     def mousePressEvent(self, event: QMouseEvent) -> None:
         pos = self.mapToScene(event.localPos().toPoint())
         x,y = int(pos.x()), int(pos.y())
@@ -80,7 +103,9 @@ class MyCanvas(QGraphicsView):
         if self.tmp_desc:
             self.tmp_desc.p_list.append(Point(x,y))
         else:
-            self.tmp_desc = ItemDesc(self.tmp_id,self.tmp_type,[Point(x,y),Point(x,y)],self.alg,self.color)
+            self.tmp_desc = ItemDesc(self.tmp_id,self.tmp_type,PointList([Point(x,y),Point(x,y)]),self.alg,self.color)
+            self.tmp_desc.fill = self.fill and self.tmp_type in ItemDesc.FILL
+            self.stroke = StrokeSimplifier()
             self.op_record.do(self.tmp_desc)
         super().mousePressEvent(event)
 
@@ -88,10 +113,10 @@ class MyCanvas(QGraphicsView):
         pos = self.mapToScene(event.localPos().toPoint())
         x,y = int(pos.x()),int(pos.y())
         if self.tmp_type == "freenom":
-            self.tmp_desc.p_list.append(Point(x,y))
+            self.stroke.add(self.tmp_desc.p_list,Point(x,y))
         else:
             self.tmp_desc.p_list[-1] = Point(x,y)
-        self.updateScene([self.sceneRect()])
+        self.op_record.refresh()
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event: QMouseEvent) -> None:
@@ -105,7 +130,10 @@ class MyCanvas(QGraphicsView):
         if self.selected_id == '':
             QMessageBox.warning(self,"Error","请选择需要删除的元素",QMessageBox.Ok)
         else:
-            self.op_record.delete(self.selected_id)
+            ids = self.selected_id.split(ItemDesc.GROUP_SEP)
+            self.clearSelection()
+            for id in ids:
+                self.op_record.delete(id)
 
     def saveToFile(self,file_name):
         self.op_record.saveToFile(file_name)
@@ -114,12 +142,12 @@ class MyCanvas(QGraphicsView):
         self.reset()
         self.op_record.loadFromFile(file_name)
     
-    def addToListWidget(self,id):
-        if not self.list_widget.findItems(id, Qt.MatchContains):
-            self.list_widget.addItem(id)
+    def addToList(self,*ids):
+        if len(ids) == 1:
+            self.list_model.add(ids[0])
+        else:
+            self.list_model.extend(ids)
 
-    def removeFromListWidget(self,id):
+    def removeFromList(self,id):
         self.clearSelection()
-        number = self.list_widget.findItems(id, Qt.MatchContains)
-        row = self.list_widget.row(number[0])
-        self.list_widget.takeItem(row)
\ No newline at end of file
+        self.list_model.remove(id)
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+.canvas画布文件的二进制格式（小端序）::
+
+    文件头    HEADER，记录各段的偏移和长度
+    图元表    每个ItemDesc一条定长的RECORD，同一对象只保存一次，保持对象间的引用关系
+    索引段    场景、撤销栈、重做栈各是一组图元表下标(u4)
+    字符串段  图元ID、类型、算法的utf-8字节
+    坐标段    所有点集首尾相接的(N,2) int32数组
+
+读取时整个文件以只读方式映射到内存，点集直接是坐标段上的视图，不会复制
+"""
+import mmap
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from itemdesc import ItemDesc
+from utils import PointList
+
+MAGIC = b'CGCANVAS'
+VERSION = 1
+
+HEADER = np.dtype([
+    ('magic','S8'),('version','<u4'),('height','<i4'),('width','<i4'),('pad','<u4'),
+    ('records','<u8',2),('scene','<u8',2),('undo','<u8',2),('redo','<u8',2),('strings','<u8',2),('coords','<u8',2),
+])
+
+# extra字段的取值
+EXTRA_NONE,EXTRA_DELETE,EXTRA_CLIP,EXTRA_POINTS,EXTRA_DESC = range(5)
+# flags字段的各位
+FLAG_FILL = 1
+
+RECORD = np.dtype([
+    ('id','<u4',2),('type','<u4',2),('alg','<u4',2),('color','u1',4),
+    ('extra','u1'),('flags','u1'),('pad','u1',6),
+    ('matrix','<f8',(3,3)),('points','<u8',2),('extra_points','<u8',2),('extra_desc','<i8'),
+])
+
+def _encode_color(color:Any) -> Tuple[int,int,int,int]:
+    return tuple(color) + (255,) * (4 - len(color))
+
+def _decode_color(rgba:Tuple[int,int,int,int]) -> Any:
+    return rgba[:3]
+
+class _Writer:
+    def __init__(self,encode_color:Callable[[Any],Tuple[int,int,int,int]]) -> None:
+        self.encode_color = encode_color
+        self.descs:List[ItemDesc] = []
+        self.desc_index:Dict[int,int] = {}
+        self.strings:Dict[str,Tuple[int,int]] = {}
+        self.string_bytes = bytearray()
+        self.coords:List[np.ndarray] = []
+        self.coord_index:Dict[int,Tuple[int,int]] = {}
+        self.n_coords = 0
+
+    def desc(self,desc:ItemDesc) -> int:
+        if id(desc) not in self.desc_index:
+            self.desc_index[id(desc)] = len(self.descs)
+            self.descs.append(desc)
+            if isinstance(desc.extra,ItemDesc):
+                self.desc(desc.extra)
+        return self.desc_index[id(desc)]
+
+    def string(self,s:str) -> Tuple[int,int]:
+        if s not in self.strings:
+            data = s.encode('utf-8')
+            self.strings[s] = (len(self.string_bytes),len(data))
+            self.string_bytes += data
+        return self.strings[s]
+
+    def points(self,p_list:PointList) -> Tuple[int,int]:
+        if id(p_list) not in self.coord_index:
+            self.coord_index[id(p_list)] = (self.n_coords,len(p_list))
+            self.coords.append(p_list.array)
+            self.n_coords += len(p_list)
+        return self.coord_index[id(p_list)]
+
+    def records(self) -> np.ndarray:
+        records = np.zeros(len(self.descs),dtype=RECORD)
+        for r,desc in zip(records,self.descs):
+            r['id'],r['type'],r['alg'] = self.string(desc.id),self.string(desc.item_type),self.string(desc.algorithm)
+            r['color'] = self.encode_color(desc.color)
+            r['matrix'] = desc.matrix
+            r['flags'] = FLAG_FILL if desc.fill else 0
+            r['points'] = self.points(desc.p_list)
+            extra = desc.extra
+            if extra is None:
+                r['extra'] = EXTRA_NONE
+            elif isinstance(extra,ItemDesc):
+                r['extra'],r['extra_desc'] = EXTRA_DESC,self.desc_index[id(extra)]
+            elif isinstance(extra,PointList):
+                r['extra'],r['extra_points'] = EXTRA_POINTS,self.points(extra)
+            else:
+                r['extra'] = EXTRA_DELETE if extra == 'delete' else EXTRA_CLIP
+        return records
+
+def save(file_name:str,height:int,width:int,scene:List[ItemDesc],undo_stk:List[ItemDesc],redo_stk:List[ItemDesc],
+         encode_color:Callable[[Any],Tuple[int,int,int,int]] = _encode_color) -> None:
+    """保存画布
+
+    先写入临时文件再替换，避免覆盖一个仍被映射在内存中的文件
+
+    :param scene: 当前场景中的图元，按叠放次序从下到上排列
+    :param undo_stk: 撤销栈
+    :param redo_stk: 重做栈
+    :param encode_color: 把图元颜色转换为(r,g,b,a)
+    """
+    writer = _Writer(encode_color)
+    sections = [np.array([writer.desc(d) for d in stk],dtype='<u4') for stk in (scene,undo_stk,redo_stk)]
+    records = writer.records()
+    coords = np.concatenate(writer.coords).astype('<i4') if writer.coords else np.empty((0,2),dtype='<i4')
+    header = np.zeros(1,dtype=HEADER)
+    header['magic'],header['version'],header['height'],header['width'] = MAGIC,VERSION,height,width
+    chunks = [records.tobytes()] + [s.tobytes() for s in sections] + [bytes(writer.string_bytes)]
+    offset = HEADER.itemsize
+    for name,chunk in zip(('records','scene','undo','redo','strings'),chunks):
+        header[name] = (offset,len(chunk))
+        offset += len(chunk)
+    padding = -offset % 8
+    header['coords'] = (offset + padding,len(coords))
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name,'wb') as file:
+        file.write(header.tobytes())
+        for chunk in chunks:
+            file.write(chunk)
+        file.write(b'\0' * padding)
+        file.write(coords.tobytes())
+    os.replace(tmp_name,file_name)
+
+def is_canvas_file(file_name:str) -> bool:
+    with open(file_name,'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+class CanvasFile:
+    """
+    以内存映射方式读取的画布文件，图元记录在第一次访问时才解码
+    """
+    def __init__(self,file_name:str,decode_color:Callable[[Tuple[int,int,int,int]],Any] = _decode_color) -> None:
+        with open(file_name,'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ)
+        header = np.frombuffer(self.buffer,HEADER,1)[0]
+        if header['magic'] != MAGIC:
+            raise ValueError('%s 不是画布文件' % file_name)
+        if header['version'] > VERSION:
+            raise ValueError('不支持的画布文件版本 %d' % header['version'])
+        self.height,self.width = int(header['height']),int(header['width'])
+        self.decode_color = decode_color
+        self.records = self._section(header['records'],RECORD)
+        self.strings = self.buffer[slice(*self._range(header['strings']))]
+        offset,count = header['coords']
+        self.coords = np.frombuffer(self.buffer,'<i4',2 * int(count),int(offset)).reshape(-1,2)
+        self.index = {name:self._section(header[name],np.dtype('<u4')) for name in ('scene','undo','redo')}
+        self.descs:Dict[int,ItemDesc] = {}
+
+    @staticmethod
+    def _range(section) -> Tuple[int,int]:
+        offset,size = int(section[0]),int(section[1])
+        return offset,offset + size
+
+    def _section(self,section,dtype:np.dtype) -> np.ndarray:
+        offset,size = int(section[0]),int(section[1])
+        return np.frombuffer(self.buffer,dtype,size // dtype.itemsize,offset)
+
+    def _string(self,span) -> str:
+        return self.strings[int(span[0]):int(span[0]) + int(span[1])].decode('utf-8')
+
+    def _points(self,span) -> PointList:
+        return PointList(self.coords[int(span[0]):int(span[0]) + int(span[1])])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def desc(self,i:int) -> ItemDesc:
+        """解码第i条图元记录，同一条记录总是得到同一个对象"""
+        i = int(i)
+        if i in self.descs:
+            return self.descs[i]
+        r = self.records[i]
+        desc = ItemDesc(self._string(r['id']),self._string(r['type']),self._points(r['points']),
+                        self._string(r['alg']),self.decode_color(tuple(int(c) for c in r['color'])))
+        desc.matrix = np.array(r['matrix'])
+        desc.fill = bool(r['flags'] & FLAG_FILL)
+        self.descs[i] = desc
+        extra = int(r['extra'])
+        if extra == EXTRA_DESC:
+            desc.extra = self.desc(r['extra_desc'])
+        elif extra == EXTRA_POINTS:
+            desc.extra = self._points(r['extra_points'])
+        elif extra != EXTRA_NONE:
+            desc.extra = 'delete' if extra == EXTRA_DELETE else 'clip'
+        return desc
+
+    def scene(self) -> List[ItemDesc]:
+        return [self.desc(i) for i in self.index['scene']]
+
+    def undo_stk(self) -> List[ItemDesc]:
+        return [self.desc(i) for i in self.index['undo']]
+
+    def redo_stk(self) -> List[ItemDesc]:
+        return [self.desc(i) for i in self.index['redo']]
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+import algorithms as alg
+from framebuffer import FrameBuffer
+from itemdesc import ItemDesc
+from utils import PointList
+
+DRAW_CMD = {
+    'drawLine':'line','drawPolygon':'polygon','drawEllipse':'ellipse','drawCurve':'curve'
+}
+
+def parse(fp) -> Iterator[Tuple[str,List[str]]]:
+    """逐行解析指令文件，不会把整个文件读入内存
+
+    :param fp: 打开的指令文件
+    :return: (指令名, 参数列表) 的迭代器，空行被跳过
+    """
+    for line in fp:
+        words = line.split()
+        if words:
+            yield words[0],words[1:]
+
+def render(save_path:str, width:int, height:int, items:List[Tuple[str,PointList,str,tuple,np.ndarray]]) -> str:
+    """绘制画布并保存为bmp
+
+    :param save_path: 保存路径
+    :param width: 画布宽度
+    :param height: 画布高度
+    :param items: (图元类型, 控制点, 算法, 颜色, 仿射矩阵) 列表
+    :return: 保存路径
+    """
+    fb = FrameBuffer(width,height,flip_y=True)
+    for item_type,p_list,algorithm,color,matrix in items:
+        fb.plot(alg.draw_transformed(item_type,p_list,algorithm,matrix),color)
+    fb.save(save_path,'bmp')
+    return save_path
+
+def run(input_file:str, output_dir:str, jobs:int = 0) -> None:
+    """执行指令文件，saveCanvas指令交给进程池并行绘制
+
+    :param input_file: 指令文件路径
+    :param output_dir: 输出目录
+    :param jobs: 进程数，为0时使用CPU核数
+    """
+    os.makedirs(output_dir,exist_ok=True)
+    item_dict:Dict[str,ItemDesc] = {}
+    pen_color = (0,0,0)
+    width,height = 1000,1000
+    jobs = jobs or os.cpu_count() or 1
+    pending:List[Future] = []
+    with ProcessPoolExecutor(jobs) as pool, open(input_file,'r') as fp:
+        for cmd,args in parse(fp):
+            if cmd == 'resetCanvas':
+                width,height = int(args[0]),int(args[1])
+                item_dict = {}
+            elif cmd == 'saveCanvas':
+                # 变换总是生成新的PointList和矩阵，因此只需保存当前引用即可得到画布快照
+                items = [(d.item_type,d.p_list,d.algorithm,d.color,d.matrix) for d in item_dict.values()]
+                save_path = os.path.join(output_dir,args[0] + '.bmp')
+                pending.append(pool.submit(render,save_path,width,height,items))
+                # 限制同时排队的任务数，避免快照堆积占用内存
+                if len(pending) >= 2 * jobs:
+                    pending.pop(0).result()
+            elif cmd == 'setColor':
+                pen_color = (int(args[0]),int(args[1]),int(args[2]))
+            elif cmd in DRAW_CMD:
+                item_type = DRAW_CMD[cmd]
+                coords = args[1:] if item_type == 'ellipse' else args[1:-1]
+                algorithm = '' if item_type == 'ellipse' else args[-1]
+                p_list = PointList(np.array(coords,dtype=np.int64).reshape(-1,2))
+                item_dict[args[0]] = ItemDesc(args[0],item_type,p_list,algorithm,pen_color)
+            elif cmd in alg.TRANS_FUNC:
+                desc = item_dict[args[0]]
+                if desc.item_type == 'ellipse' and cmd in alg.AFFINE:
+                    # 椭圆的控制点无法表示旋转，变换累积到矩阵中，绘制时仍按参数形式光栅化
+                    desc.matrix = alg.affine_matrix(cmd,args[1:]) @ desc.matrix
+                elif cmd == 'clip':
+                    if desc.item_type not in alg.CLIP_TYPES:
+                        print('跳过裁剪：图元%s的类型%s不能裁剪' % (args[0],desc.item_type),file=sys.stderr)
+                        continue
+                    window = tuple(int(a) for a in args[1:5])
+                    desc.p_list = alg.clip_shape(desc.item_type,desc.p_list,window,args[5])
+                else:
+                    desc.p_list = alg.transform(cmd,[desc.p_list] + args[1:])
+        for future in pending:
+            future.result()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按指令文件绘制并保存画布')
+    parser.add_argument('input_file',help='指令文件')
+    parser.add_argument('output_dir',help='输出目录')
+    parser.add_argument('-j','--jobs',type=int,default=0,help='并行绘制的进程数，默认为CPU核数')
+    args = parser.parse_args()
+    run(args.input_file,args.output_dir,args.jobs)
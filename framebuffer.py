@@ -0,0 +1,76 @@
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils import PointList
+
+class FrameBuffer:
+    """
+    软件帧缓冲，以HxWx3的uint8数组保存画布，像素点通过一次索引赋值整体写入
+    """
+    def __init__(self,width:int,height:int,background:Tuple[int,int,int] = (255,255,255),flip_y:bool = False,
+                 origin:Tuple[int,int] = (0,0)) -> None:
+        """
+        :param width: 画布宽度
+        :param height: 画布高度
+        :param background: 背景颜色(r,g,b)
+        :param flip_y: 为True时y轴向上（命令行绘图的约定），否则与图形界面一样y轴向下
+        :param origin: 帧缓冲左上角在画布上的坐标，用于只绘制画布的一块
+        """
+        self.width,self.height = width,height
+        self.origin = origin
+        self.background = background
+        self.flip_y = flip_y
+        self.data = np.empty((height,width,3),dtype=np.uint8)
+        self.clear()
+
+    @property
+    def window(self) -> Tuple[int,int,int,int]:
+        """帧缓冲覆盖的画布区域 (x_min, y_min, x_max, y_max)"""
+        x,y = self.origin
+        return x,y,x + self.width - 1,y + self.height - 1
+
+    def clear(self) -> None:
+        r,g,b = self.background
+        if r == g == b:
+            # 三个通道相同时（如白色背景）直接按字节填充，比逐像素广播颜色快得多
+            self.data.fill(r)
+        else:
+            self.data[:] = self.background
+
+    def plot(self,pixels:PointList|np.ndarray,color:Tuple[int,int,int]) -> None:
+        """写入像素点，超出画布的点被丢弃
+
+        :param pixels: 像素点坐标，PointList或形状为(N,2)的数组
+        :param color: 颜色(r,g,b)
+        """
+        pts = pixels.array if isinstance(pixels,PointList) else np.asarray(pixels)
+        x,y = pts[:,0] - self.origin[0],pts[:,1] - self.origin[1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        x,y = x[inside],y[inside]
+        if self.flip_y:
+            y = self.height - 1 - y
+        # 按通道写入扁平下标，比按(y,x)整体赋值一个颜色快
+        index = y * self.width + x
+        pixels = self.data.reshape(-1,3)
+        for channel,value in enumerate(color):
+            pixels[index,channel] = value
+
+    def fill(self,spans:np.ndarray,color:Tuple[int,int,int]) -> None:
+        """按水平线段填充，每段一次切片赋值，超出画布的部分被裁掉
+
+        :param spans: (array of int) 水平线段 (y, x0, x1)，两端都包含在内，形状为(M,3)
+        :param color: 颜色(r,g,b)
+        """
+        ox,oy = self.origin
+        y,x0,x1 = spans[:,0] - oy,np.maximum(spans[:,1] - ox,0),np.minimum(spans[:,2] - ox,self.width - 1)
+        inside = (y >= 0) & (y < self.height) & (x0 <= x1)
+        if self.flip_y:
+            y = self.height - 1 - y
+        for y,x0,x1 in zip(y[inside].tolist(),x0[inside].tolist(),x1[inside].tolist()):
+            self.data[y,x0:x1 + 1] = color
+
+    def save(self,file_name:str,format:str|None = None) -> None:
+        """保存为图片，格式由format或文件扩展名决定，如bmp、png、jpg"""
+        Image.fromarray(self.data).save(file_name,format)
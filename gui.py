@@ -5,16 +5,25 @@ from PyQt5.QtWidgets import (
     QMainWindow,
     qApp,
     QGraphicsScene,
-    QListWidget,
+    QListView,
+    QLineEdit,
+    QVBoxLayout,
     QHBoxLayout,
     QWidget,
     QMessageBox,
     QInputDialog,
     QAction,
     QFileDialog,
+    QLabel,
+    QAbstractItemView,
 )
+from PyQt5.QtCore import QTimer
 from canvas import MyCanvas
-from PyQt5.QtGui import QImage,QPainter,QColor
+from itemdesc import ItemDesc
+from framebuffer import FrameBuffer
+from tracing import tracer
+
+TRACE_INTERVAL = 1000  # 性能追踪汇总在状态栏中的刷新间隔（毫秒）
 
 class MainWindow(QMainWindow):
     """
@@ -24,9 +33,14 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.item_cnt = 0
 
-        # 使用QListWidget来记录已有的图元，并用于选择图元。注：这是图元选择的简单实现方法，更好的实现是在画布中直接用鼠标选择图元
-        self.list_widget = QListWidget(self)
-        self.list_widget.setMinimumWidth(200)
+        # 使用QListView显示已有的图元，并用于选择图元。注：这是图元选择的简单实现方法，更好的实现是在画布中直接用鼠标选择图元
+        self.list_view = QListView(self)
+        self.list_view.setMinimumWidth(200)
+        self.list_view.setUniformItemSizes(True)
+        # 按住Ctrl或Shift可以选择多个图元，变换同时作用于所有选中的图元
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.filter_edit = QLineEdit(self)
+        self.filter_edit.setPlaceholderText('筛选图元ID')
 
         # 使用QGraphicsView作为画布
         self.scene = QGraphicsScene(self)
@@ -35,13 +49,17 @@ class MainWindow(QMainWindow):
         self.canvas:MyCanvas = MyCanvas(self.scene, self)
         self.canvas.setFixedSize(h, w)
         self.canvas.main_window = self
-        self.canvas.list_widget = self.list_widget
+        self.canvas.list_view = self.list_view
+        self.list_view.setModel(self.canvas.list_model)
         self.modified = False
         self.file_name = ''
         # 设置菜单栏
         menubar = self.menuBar()
         file_menu = menubar.addMenu('文件')
         file_menu.addAction('设置画笔').triggered.connect(self.canvas.setColor)
+        fill_action = file_menu.addAction('填充图形')
+        fill_action.setCheckable(True)
+        fill_action.toggled.connect(self.canvas.setFill)
         file_menu.addAction('重置画布').triggered.connect(self.resetCanvas)
         file_menu.addAction('调整画布大小').triggered.connect(partial(self.resetCanvas,True))
         file_menu.addAction('保存画布').triggered.connect(self.save_slot)
@@ -74,8 +92,16 @@ class MainWindow(QMainWindow):
         self.redo_action.triggered.connect(self.canvas.op_record.redo)
         self.delete_action = history_menu.addAction('删除')
         self.delete_action.triggered.connect(self.canvas.deleteItem)
+        self.compact_action = history_menu.addAction('压缩历史')
+        self.compact_action.triggered.connect(self.compact_slot)
         self.canvas.actionChanged.connect(self.updateMenu)
         self.updateMenu()
+        debug_menu = menubar.addMenu('调试')
+        trace_action = debug_menu.addAction('性能追踪')
+        trace_action.setCheckable(True)
+        trace_action.setChecked(tracer.enabled)
+        trace_action.toggled.connect(self.trace_slot)
+        debug_menu.addAction('导出追踪').triggered.connect(self.export_trace_slot)
         # 连接信号和file_menu.children()槽函数
         for func_menu in [draw_menu,edit_menu]:
             for menu in func_menu.children():
@@ -87,15 +113,25 @@ class MainWindow(QMainWindow):
                 for action in menu.children():
                     algr = action.text()
                     action.triggered.connect(partial(self.draw_slot,type,algr))                    
-        self.list_widget.currentTextChanged.connect(self.canvas.selectionChanged)
+        self.list_view.selectionModel().selectionChanged.connect(self.selection_slot)
+        self.filter_edit.textChanged.connect(self.filter_slot)
         # 设置主窗口的布局
+        self.list_layout = QVBoxLayout()
+        self.list_layout.addWidget(self.filter_edit)
+        self.list_layout.addWidget(self.list_view)
         self.hbox_layout = QHBoxLayout()
         self.hbox_layout.addWidget(self.canvas)
-        self.hbox_layout.addWidget(self.list_widget, stretch=1)
+        self.hbox_layout.addLayout(self.list_layout, stretch=1)
         self.central_widget = QWidget()
         self.central_widget.setLayout(self.hbox_layout)
         self.setCentralWidget(self.central_widget)
         self.statusBar().showMessage('freenom')
+        # 打开性能追踪时在状态栏右侧显示最近一段时间的汇总
+        self.trace_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.trace_label)
+        self.trace_timer = QTimer(self)
+        self.trace_timer.timeout.connect(lambda: self.trace_label.setText(tracer.status()))
+        self.trace_slot(tracer.enabled)
         self.resize(h, w)
         self.setWindowTitle('CG Demo')
         self.canvas.start("freenom","")
@@ -108,15 +144,21 @@ class MainWindow(QMainWindow):
     def resetCanvas(self,resize=False):
         h,w = None,None
         if resize:
-            h = QInputDialog.getInt(self, '请输入', '长度', 800, 200, 1500)[0]
-            w = QInputDialog.getInt(self, '请输入', '宽度', 800, 200, 900)[0]
-            self.scene.setSceneRect(0, 0, h, w)
-        self.list_widget.clearSelection()
-        self.list_widget.clear()
+            h = QInputDialog.getInt(self, '请输入', '长度', 800, 200, 20000)[0]
+            w = QInputDialog.getInt(self, '请输入', '宽度', 800, 200, 20000)[0]
         self.item_cnt = 0
         self.file_name = ''
         self.canvas.reset(h,w)
 
+    def selection_slot(self):
+        rows = sorted(index.row() for index in self.list_view.selectionModel().selectedRows())
+        model = self.canvas.list_model
+        self.canvas.selectionChanged(ItemDesc.GROUP_SEP.join(model.rows[row] for row in rows))
+
+    def filter_slot(self,pattern:str):
+        self.canvas.clearSelection()
+        self.canvas.list_model.setFilter(pattern)
+
     def draw_slot(self,type:str,algr:str):
         type = type.lower()
         if self.canvas.start(type,algr):
@@ -135,14 +177,25 @@ class MainWindow(QMainWindow):
         file_name = QFileDialog.getSaveFileName(self,caption="导出画布", filter="bmp;;png;;jpg")
         if file_name[0] != '':
             scene = self.canvas.scene()
-            scene.clearSelection()
-            image = QImage(scene.sceneRect().size().toSize(), QImage.Format.Format_ARGB32)
-            image.fill(QColor(255,255,255))
-            painter = QPainter(image)
-            scene.render(painter)
-            image.save(file_name[0]+'.'+file_name[1])
-            painter.end()
+            size = scene.sceneRect().size().toSize()
+            fb = FrameBuffer(size.width(),size.height())
+            for item in self.canvas.op_record.itemsIn((0,0,fb.width-1,fb.height-1)):
+                item.blit(fb)
+            fb.save(file_name[0]+'.'+file_name[1])
             
+    def trace_slot(self,enabled:bool):
+        tracer.enable(enabled)
+        self.trace_label.setVisible(enabled)
+        if enabled:
+            self.trace_timer.start(TRACE_INTERVAL)
+        else:
+            self.trace_timer.stop()
+
+    def export_trace_slot(self):
+        file_name = QFileDialog.getSaveFileName(self,caption="导出追踪", filter="json")
+        if file_name[0] != '':
+            tracer.export(file_name[0]+'.'+file_name[1])
+
     def save_slot(self):
         if self.file_name == '':
             file_name = QFileDialog.getSaveFileName(self,caption="保存画布", filter="canvas")
@@ -157,6 +210,11 @@ class MainWindow(QMainWindow):
             self.file_name = file_name[0]
         self.canvas.loadFromFile(self.file_name)
     
+    def compact_slot(self):
+        ret = QMessageBox.question(self, '压缩历史', '压缩后将无法撤销之前的操作，是否继续？', QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if ret == QMessageBox.Yes:
+            self.canvas.op_record.compact()
+
     def closeEvent(self, e) -> None:
         self.quit_slot()
         return super().closeEvent(e)
@@ -164,6 +222,7 @@ class MainWindow(QMainWindow):
     def updateMenu(self):
         self.undo_action.setEnabled(self.canvas.op_record.canUndo())
         self.redo_action.setEnabled(self.canvas.op_record.canRedo())
+        self.compact_action.setEnabled(self.canvas.op_record.canUndo())
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,139 @@
+import pickle
+import tempfile
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from canvasfile import CanvasFile
+from itemdesc import ItemDesc
+from tracing import traced
+from utils import PointList
+
+HISTORY_BUDGET = 32 * 1024 * 1024  # 每个栈常驻内存的历史记录字节数上限
+ENTRY_OVERHEAD = 512  # 一条记录除点集外的估计字节数（对象、属性字典、变换矩阵等）
+
+def entry_nbytes(desc:ItemDesc) -> int:
+    """估计一条历史记录占用的内存"""
+    nbytes = ENTRY_OVERHEAD + desc.p_list.nbytes
+    if isinstance(desc.extra,PointList):
+        nbytes += desc.extra.nbytes
+    return nbytes
+
+class HistoryStack:
+    """
+    撤销/重做栈，从栈底到栈顶依次分为三段：
+
+        pending  从画布文件恢复的记录，只保存记录下标，需要时才解码
+        spilled  超出内存预算后换出到磁盘日志的记录，按批保存
+        items    常驻内存的栈顶记录
+
+    栈顶记录用完后，先从磁盘日志、再从画布文件按页换入，
+    因此打开文件的开销只与当前场景有关，长时间编辑时内存也不会随历史记录无限增长
+
+    绘制记录就是场景中图元自身的描述，由live判断；这样的记录不计入预算，
+    换出时也留在内存中，日志里只占一个位置，否则换出既释放不了内存，又会随场景增大反复写盘
+    """
+    PAGE = 256  # 从画布文件每次解码的记录数
+
+    def __init__(self,canvas:Optional[CanvasFile] = None,index:Optional[np.ndarray] = None,
+                 budget:int = HISTORY_BUDGET,live:Callable[[ItemDesc],bool] = lambda desc: False) -> None:
+        self.canvas = canvas
+        self.pending = index if index is not None else np.empty(0,dtype=np.uint32)
+        # 每批换出记录在日志中的(偏移, 字节数, 条数)，以及这一批中留在内存里的记录{批内下标: 记录}
+        self.spilled:List[Tuple[int,int,int,Dict[int,ItemDesc]]] = []
+        self.n_spilled = 0
+        self.journal:Optional[IO[bytes]] = None
+        self.items:List[ItemDesc] = []
+        self.budget = budget
+        self.live = live
+        self.nbytes = 0  # items中不是图元自身描述的记录的估计字节数
+
+    def _nbytes(self,desc:ItemDesc) -> int:
+        return 0 if self.live(desc) else entry_nbytes(desc)
+
+    def _load(self,offset:int,size:int,kept:Dict[int,ItemDesc]) -> List[ItemDesc]:
+        self.journal.seek(offset)
+        descs = pickle.loads(self.journal.read(size))
+        for i,desc in kept.items():
+            descs[i] = desc
+        return descs
+
+    @traced('history.page')
+    def _page(self) -> None:
+        if self.spilled:
+            offset,size,count,kept = self.spilled.pop()
+            descs = self._load(offset,size,kept)
+            # 日志只在末尾换入换出，换入后直接截断
+            self.journal.truncate(offset)
+            self.n_spilled -= count
+        else:
+            k = max(0,len(self.pending) - self.PAGE)
+            descs = [self.canvas.desc(i) for i in self.pending[k:]]
+            self.pending = self.pending[:k]
+        self.items[:0] = descs
+        self.nbytes += sum(self._nbytes(desc) for desc in descs)
+
+    @traced('history.spill')
+    def _spill(self) -> None:
+        """把最旧的常驻记录写入磁盘日志，直到占用降到预算的一半，栈顶记录始终保留在内存中"""
+        # 记录入栈后仍可能被修改（如裁剪完成时），换出前重新计算
+        sizes = [self._nbytes(desc) for desc in self.items]
+        self.nbytes = sum(sizes)
+        if self.nbytes <= self.budget:
+            return
+        count,freed = 0,0
+        while count < len(self.items) - 1 and self.nbytes - freed > self.budget // 2:
+            freed += sizes[count]
+            count += 1
+        if count == 0:
+            return
+        if self.journal is None:
+            self.journal = tempfile.TemporaryFile(prefix='cg-history-')
+        kept = {i:desc for i,desc in enumerate(self.items[:count]) if self.live(desc)}
+        data = pickle.dumps([None if i in kept else desc for i,desc in enumerate(self.items[:count])],pickle.HIGHEST_PROTOCOL)
+        self.journal.seek(0,2)
+        self.spilled.append((self.journal.tell(),len(data),count,kept))
+        self.journal.write(data)
+        self.n_spilled += count
+        del self.items[:count]
+        self.nbytes -= freed
+
+    def __len__(self) -> int:
+        return len(self.pending) + self.n_spilled + len(self.items)
+
+    def __iter__(self) -> Iterator[ItemDesc]:
+        """从栈底到栈顶遍历，换出的记录临时从日志读出，不改变栈的状态"""
+        for i in self.pending:
+            yield self.canvas.desc(i)
+        for offset,size,_,kept in self.spilled:
+            yield from self._load(offset,size,kept)
+        yield from self.items
+
+    def __getitem__(self,index:int) -> ItemDesc:
+        """只支持从栈顶开始的负数下标"""
+        while -index > len(self.items) and len(self) > len(self.items):
+            self._page()
+        return self.items[index]
+
+    def append(self,desc:ItemDesc) -> None:
+        self.items.append(desc)
+        self.nbytes += self._nbytes(desc)
+        if self.nbytes > self.budget:
+            self._spill()
+
+    def pop(self) -> ItemDesc:
+        if not self.items and len(self):
+            self._page()
+        desc = self.items.pop()
+        self.nbytes = max(0,self.nbytes - self._nbytes(desc))
+        return desc
+
+    def clear(self) -> None:
+        self.pending = self.pending[:0]
+        self.spilled.clear()
+        self.n_spilled = 0
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.items.clear()
+        self.nbytes = 0
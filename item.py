@@ -1,30 +1,89 @@
-from utils import Point
+from framebuffer import FrameBuffer
+from spatial import RECT
+from tracing import tracer,traced
+from rasterworker import RasterWorker
+from itemdesc import ItemDesc
+from utils import PointList, as_point_list
 import algorithms as alg
-from typing import List, Optional
+import math
+import numpy as np
+from collections import OrderedDict
+from functools import partial
+from typing import List, Optional, Tuple
 from PyQt5.QtWidgets import (
     QGraphicsItem,
     QWidget,
     QStyleOptionGraphicsItem,
 )
-from PyQt5.QtGui import QPainter, QColor
-from PyQt5.QtCore import QRectF
-
-class ItemDesc:
-    DRAW = ["line","polygon","ellipse","curve","freenom","rect"]
-    APPEND = ["polygon","curve","freenom"]
-    INC = ["line","ellipse"]
-    # IRREVERSIBLE = ["clip","scale"]
-    def __init__(self,item_id: str, item_type: str, p_list: list, algorithm: str = '',color:QColor = QColor(0,0,0)) -> None:
-        self.id = item_id           # 图元ID
-        self.item_type = item_type  # 图元类型，'line'、'polygon'、'ellipse'、'curve'等
-        self.p_list:List[Point] = p_list        # 图元参数
-        self.algorithm = algorithm  # 绘制算法，'DDA'、'Bresenham'、'Bezier'、'B-spline'等
-        self.selected = False
-        self.color = color
-        self.extra:str|ItemDesc = None
-
-    def copy(self) -> 'ItemDesc':
-        return ItemDesc(self.id,self.item_type,self.p_list,self.algorithm,self.color)
+from PyQt5.QtGui import QPainter, QColor, QPen, QPolygon, QPolygonF, QImage
+from PyQt5.QtCore import QRectF, QPointF, Qt
+
+RASTER_CACHE_BUDGET = 64 * 1024 * 1024  # 光栅化缓存的总字节数上限
+BLIT_DENSITY = 1 / 16  # 像素点占包围盒的比例不低于该值时整体画成一张图片，否则一次drawPoints
+ASYNC_COST = 5000  # 估计的光栅化耗时（微秒）超过该值时在后台线程中计算，完成前先显示控制多边形
+
+class RasterCache:
+    """
+    图元光栅化结果的缓存，整个场景共享同一个按字节计的LRU预算
+    """
+    def __init__(self,budget:int = RASTER_CACHE_BUDGET) -> None:
+        self.budget = budget
+        self.size = 0
+        self.entries:OrderedDict[int,Tuple[tuple,List[PointList],int]] = OrderedDict()
+
+    def key(self,owner:int) -> Optional[tuple]:
+        entry = self.entries.get(owner)
+        return entry[0] if entry is not None else None
+
+    def get(self,owner:int,key:tuple) -> Optional[List[PointList]]:
+        entry = self.entries.get(owner)
+        if entry is None or entry[0] != key:
+            return None
+        self.entries.move_to_end(owner)
+        return entry[1]
+
+    def put(self,owner:int,key:tuple,layers:List[PointList]) -> None:
+        self.discard(owner)
+        nbytes = sum(layer.nbytes for layer in layers)
+        if nbytes > self.budget:
+            return
+        self.entries[owner] = (key,layers,nbytes)
+        self.size += nbytes
+        while self.size > self.budget:
+            _,(_,_,evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+
+    def discard(self,owner:int) -> None:
+        entry = self.entries.pop(owner,None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+raster_cache = RasterCache()
+raster_worker = RasterWorker()
+
+def raster_layers(item_type:str,p_list:PointList,algorithm:str,matrix:np.ndarray,fill:bool,window:RECT|None) -> List[PointList|np.ndarray]:
+    """光栅化图元的各层：像素点、曲线的控制多边形、填充的水平线段，不访问任何Qt对象，可以在工作线程中调用"""
+    with tracer.span('rasterize'):
+        layers = [alg.draw_transformed(item_type,p_list,algorithm,matrix,window)]
+        if item_type == 'curve':
+            layers.append(alg.draw('polygon',alg.apply_matrix(p_list,matrix),'',window))
+        if fill:
+            layers.append(alg.fill_transformed(item_type,p_list,matrix,window))
+    tracer.count('pixels',len(layers[0]))
+    return layers
+
+def raster_cost(desc:ItemDesc,bounds:RECT) -> int:
+    """估计光栅化的耗时（微秒），像素数大致与包围盒的周长成正比，曲线还取决于控制点数"""
+    x_min,y_min,x_max,y_max = bounds
+    n = len(desc.p_list)
+    cost = (x_max - x_min + y_max - y_min) // 5 + n // 2
+    if desc.item_type == 'curve':
+        cost += n * (200 if desc.algorithm == 'Bezier' else 40)
+    return cost
 
 class MyItem(QGraphicsItem):
     """
@@ -39,35 +98,194 @@ class MyItem(QGraphicsItem):
         :param parent:
         """
         super().__init__(parent)
+        # 让paint拿到真正需要重绘的区域，只光栅化其中的部分
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
         self.desc = desc
+        self._bounds:RECT|None = None   # 控制点包围盒的缓存，图元变化时由invalidate清除
+        self.tiled = False  # 为True时图元内容由图块层绘制，自己只画选中框
     
     @staticmethod
-    def draw(type,p_list,algr,painter:QPainter,color):
-        item_pixels = alg.draw(type,p_list,algr)
-        painter.setPen(color)
-        for p in item_pixels:
-            painter.drawPoint(p.x,p.y)
+    def draw(item_pixels:PointList,painter:QPainter,color):
+        """一次提交全部像素点：密集时写入ARGB图片后drawImage，稀疏时填入QPolygon的缓冲区后drawPoints"""
+        pts = item_pixels.array
+        n = len(pts)
+        if n == 0:
+            return
+        x_min,y_min = pts.min(axis=0).tolist()
+        x_max,y_max = pts.max(axis=0).tolist()
+        w,h = x_max - x_min + 1,y_max - y_min + 1
+        if n >= 64 and n >= w * h * BLIT_DENSITY:
+            # QImage直接引用NumPy缓冲区，在drawImage返回前buf一直有效
+            buf = np.zeros((h,w),dtype=np.uint32)
+            buf[pts[:,1] - y_min,pts[:,0] - x_min] = QColor(color).rgba()
+            painter.drawImage(x_min,y_min,QImage(buf.data,w,h,w * 4,QImage.Format_ARGB32))
+        else:
+            polygon = QPolygon(n)
+            ptr = polygon.data()
+            ptr.setsize(n * 8)
+            np.frombuffer(ptr,dtype=np.int32).reshape(n,2)[:] = pts
+            painter.setPen(color)
+            painter.drawPoints(polygon)
+
+    @staticmethod
+    def fill(spans:np.ndarray,painter:QPainter,color):
+        """按水平线段 (y, x0, x1) 填充，每段一次fillRect"""
+        for y,x0,x1 in spans.tolist():
+            painter.fillRect(x0,y,x1 - x0 + 1,1,color)
+
+    def transformMatrix(self) -> np.ndarray:
+        """图元累积的变换与未完成的变换合成的仿射矩阵"""
+        desc,extra = self.desc,self.desc.extra
+        matrix = desc.matrix
+        if isinstance(extra,ItemDesc):
+            matrix = alg.p_matrix(extra.item_type,extra.p_list) @ matrix
+        return matrix
+
+    def transformedPList(self) -> PointList:
+        return alg.apply_matrix(self.desc.p_list,self.transformMatrix())
+
+    def rasterize(self,window:RECT|None = None,wait:bool = True) -> List[PointList|np.ndarray]|None:
+        """返回图元的像素点，曲线额外返回控制多边形，填充的图元最后一层是水平线段，结果按图元参数和未完成的变换缓存
+
+        :param window: 可见窗口，图元超出窗口时只光栅化窗口附近的部分，已缓存完整结果时直接返回完整结果
+        :param wait: 为False时耗时较长的光栅化提交到后台线程，结果未就绪时返回None，完成后图元自动重绘
+        """
+        desc = self.desc
+        key = self.rasterKey()
+        layers = raster_cache.get(id(self),key)
+        if layers is not None:
+            return layers
+        bounds = self.bounds()
+        deferred = not wait and raster_cost(desc,bounds) > ASYNC_COST
+        if deferred:
+            # 后台计算整个画布范围内的部分，拖动时可见区域的变化不会使结果失效
+            window = self.sceneWindow()
+        x_min,y_min,x_max,y_max = bounds
+        if window is not None and window[0] <= x_min and window[1] <= y_min and window[2] >= x_max and window[3] >= y_max:
+            window = None
+        if window is not None:
+            key += (window,)
+            layers = raster_cache.get(id(self),key)
+        if layers is None and deferred:
+            # 控制点可能在GUI线程中被原地修改，交给工作线程的是副本
+            args = (desc.item_type,PointList(desc.p_list.array.copy()),desc.algorithm,self.transformMatrix().copy(),self.filled(),window)
+            raster_worker.submit(id(self),key,raster_layers,args,partial(self.rasterized,key))
+        elif layers is None and raster_worker.pending(id(self),key):
+            # 后台已在计算同样的结果（如刚绘制完成转入图块时），等它完成而不是在GUI线程中重新计算
+            layers = raster_worker.wait(id(self))
+        elif layers is None:
+            layers = raster_layers(desc.item_type,desc.p_list,desc.algorithm,self.transformMatrix(),self.filled(),window)
+            raster_cache.put(id(self),key,layers)
+        return layers
+
+    def rasterKey(self) -> tuple:
+        """光栅化结果的标识：图元参数和合成后的变换，只光栅化部分窗口时rasterize在末尾另加窗口"""
+        desc = self.desc
+        return (desc.item_type,desc.algorithm,desc.fill,desc.p_list.array.tobytes(),self.transformMatrix().tobytes())
+
+    def rasterized(self,key:tuple,layers:List[PointList|np.ndarray]) -> None:
+        """后台光栅化完成，在GUI线程中调用"""
+        raster_cache.put(id(self),key,layers)
+        self.update()
+
+    def sceneWindow(self) -> RECT|None:
+        scene = self.scene()
+        if scene is None:
+            return None
+        rect = scene.sceneRect()
+        return (math.floor(rect.left()),math.floor(rect.top()),math.ceil(rect.right()),math.ceil(rect.bottom()))
+
+    def drawPlaceholder(self,painter:QPainter) -> None:
+        """光栅化结果就绪前的占位：变换后的控制多边形，椭圆为包围盒"""
+        pen = QPen(self.desc.color)
+        pen.setStyle(Qt.DashLine)
+        painter.setPen(pen)
+        if self.desc.item_type == 'ellipse':
+            x_min,y_min,x_max,y_max = self.bounds()
+            painter.drawRect(x_min,y_min,x_max - x_min,y_max - y_min)
+        else:
+            painter.drawPolyline(QPolygonF([QPointF(x,y) for x,y in self.transformedPList().array.tolist()]))
+
+    def blit(self,fb:FrameBuffer) -> None:
+        """把图元直接写入软件帧缓冲，与paint绘制的内容一致（不含选中框）
+
+        缓存中每个图元只保留一个结果，因此总是按整个画布光栅化，
+        帧缓冲只覆盖部分图块时，之后写入其余图块也不必重新光栅化
+        """
+        layers = self.rasterize(self.sceneWindow())
+        if self.filled():
+            fb.fill(layers[-1],self.desc.color.getRgb()[:3])
+        fb.plot(layers[0],self.desc.color.getRgb()[:3])
+        if self.desc.item_type == 'curve':
+            fb.plot(layers[1],(0,0,255))
+
+    def filled(self) -> bool:
+        return self.desc.fill and self.desc.item_type in ItemDesc.FILL
+
+    def invalidate(self) -> None:
+        """图元参数或变换改变后调用，清除包围盒和像素缓存，并只重绘变化前后的包围盒区域
+
+        包围盒是缓存的，所以在修改图元之后再调用时prepareGeometryChange拿到的仍是旧的包围盒；
+        光栅化结果只在改变了像素时丢弃，绘制或变换完成时的结果和未完成的后台任务仍可使用
+        """
+        self.prepareGeometryChange()
+        self._bounds = None
+        key = self.rasterKey()
+        if not MyItem.sameRaster(raster_cache.key(id(self)),key):
+            raster_cache.discard(id(self))
+        if not MyItem.sameRaster(raster_worker.key(id(self)),key):
+            raster_worker.cancel(id(self))
+        self.update()
+
+    def release(self) -> None:
+        """图元从场景中删除后调用，释放光栅化结果并取消后台任务"""
+        self.invalidate()
+        raster_cache.discard(id(self))
+        raster_worker.cancel(id(self))
+
+    @staticmethod
+    def sameRaster(stored:tuple|None,key:tuple) -> bool:
+        """stored是否是key对应的完整结果或某个窗口内的结果"""
+        return stored is not None and (stored == key or stored[:-1] == key)
     
+    @traced('paint')
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = ...) -> None:
-        p_list,desc,extra = self.desc.p_list,self.desc,self.desc.extra
-        if isinstance(extra,ItemDesc):
-            p_list = alg.p_transform(extra.item_type,p_list,extra.p_list,extra.algorithm)
-        MyItem.draw(desc.item_type,p_list,desc.algorithm,painter,desc.color)
-        if desc.item_type == 'curve':
-            MyItem.draw('polygon',p_list,'',painter,QColor(0,0,255))
+        tracer.count('items_painted')
+        desc = self.desc
+        if not self.tiled:
+            exposed = option.exposedRect
+            window = (math.floor(exposed.left()),math.floor(exposed.top()),math.ceil(exposed.right()),math.ceil(exposed.bottom()))
+            layers = self.rasterize(window,wait=False)
+            if layers is None:
+                self.drawPlaceholder(painter)
+            else:
+                if self.filled():
+                    MyItem.fill(layers[-1],painter,desc.color)
+                MyItem.draw(layers[0],painter,desc.color)
+                if desc.item_type == 'curve':
+                    MyItem.draw(layers[1],painter,QColor(0,0,255))
         if desc.selected:
             painter.setPen(QColor(255, 0, 0))
             painter.drawRect(self.boundingRect())
 
-    def boundingRect(self) -> List[Point]:
-        p_list,extra = self.desc.p_list,self.desc.extra
-        if isinstance(extra,ItemDesc):
-            p_list = alg.p_transform(extra.item_type,p_list,extra.p_list,extra.algorithm)
-        x_min,x_max,y_min,y_max = 100000,-1,10000,-1
-        for p in p_list:
-            x_min,x_max = min(x_min,p.x),max(x_max,p.x)
-            y_min,y_max = min(y_min,p.y),max(y_max,p.y)
+    def bounds(self) -> RECT:
+        if self._bounds is None:
+            tracer.count('bounds')
+        if self._bounds is None and self.desc.item_type == 'ellipse':
+            # 旋转后的椭圆超出控制点的范围，按变换后的参数计算
+            self._bounds = alg.ellipse_bounds(self.desc.p_list,self.transformMatrix())
+        if self._bounds is None:
+            p_list = self.transformedPList()
+            xs,ys = p_list.xs,p_list.ys
+            x_min,x_max = int(np.min(xs,initial=100000)),int(np.max(xs,initial=-1))
+            y_min,y_max = int(np.min(ys,initial=10000)),int(np.max(ys,initial=-1))
+            self._bounds = (x_min,y_min,x_max,y_max)
+        return self._bounds
+
+    def boundingRect(self) -> QRectF:
+        x_min,y_min,x_max,y_max = self.bounds()
         return QRectF(x_min-1,y_min-1,x_max-x_min+2,y_max-y_min+2 )
     
     def setPList(self,p_list):
-        self.desc.p_list = p_list
\ No newline at end of file
+        self.desc.p_list = as_point_list(p_list)
+        self.invalidate()
\ No newline at end of file
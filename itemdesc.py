@@ -0,0 +1,42 @@
+from typing import Any, List
+
+import numpy as np
+
+from utils import PointList, as_point_list
+
+class ItemDesc:
+    DRAW = ["line","polygon","ellipse","curve","freenom","rect"]
+    APPEND = ["polygon","curve"]
+    INC = ["line","ellipse","freenom"]
+    FILL = ["polygon","ellipse"]  # 可以填充的图元类型
+    GROUP_SEP = ","  # 同时作用于多个图元的变换，id由各图元的id以逗号连接
+    # IRREVERSIBLE = ["clip","scale"]
+    def __init__(self,item_id: str, item_type: str, p_list: PointList, algorithm: str = '',color:Any = (0,0,0)) -> None:
+        self.id = item_id           # 图元ID
+        self.item_type = item_type  # 图元类型，'line'、'polygon'、'ellipse'、'curve'等
+        self.p_list:PointList = as_point_list(p_list)        # 图元参数
+        self.algorithm = algorithm  # 绘制算法，'DDA'、'Bresenham'、'Bezier'、'B-spline'等
+        self.selected = False
+        self.fill = False           # 是否填充内部，只对FILL中的类型有效
+        self.color = color          # 画笔颜色，图形界面中为QColor，命令行中为(r,g,b)
+        self.extra:str|ItemDesc = None
+        self.matrix:np.ndarray = np.eye(3)  # 累积的仿射变换，绘制时才作用到p_list上
+
+    def __setstate__(self,state:dict) -> None:
+        # 兼容旧版本以pickle保存的画布
+        state.setdefault('matrix',np.eye(3))
+        state.setdefault('fill',False)
+        self.__dict__.update(state)
+        self.p_list = as_point_list(self.p_list)
+        if isinstance(self.extra,list):
+            self.extra = as_point_list(self.extra)
+
+    def ids(self) -> List[str]:
+        """变换作用的图元id列表，绘制类的描述只有自身的id"""
+        return self.id.split(ItemDesc.GROUP_SEP)
+
+    def copy(self) -> 'ItemDesc':
+        desc = ItemDesc(self.id,self.item_type,self.p_list,self.algorithm,self.color)
+        desc.matrix = self.matrix.copy()
+        desc.fill = self.fill
+        return desc
@@ -0,0 +1,112 @@
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+def id_key(item_id:str) -> tuple:
+    """图元id的排序键，数字id按数值大小排列"""
+    return len(item_id),item_id
+
+class ItemListModel(QAbstractListModel):
+    """
+    侧栏图元列表的模型
+
+    registry以id为键登记所有图元，查找和删除都是O(1)；rows是通过筛选的id，按id_key有序，
+    定位某一行只需二分查找。视图按需调用fetchMore，每次只把FETCH行交给视图，图元很多时列表仍然流畅
+    """
+    FETCH = 256  # 每次交给视图的行数
+
+    def __init__(self,parent=None) -> None:
+        super().__init__(parent)
+        self.registry:Dict[str,None] = {}
+        self.rows:List[str] = []
+        self.fetched = 0    # 已经交给视图的行数，rows的其余部分在滚动到末尾时再加入
+        self.pattern = ''
+
+    def __contains__(self,item_id:str) -> bool:
+        return item_id in self.registry
+
+    def __len__(self) -> int:
+        return len(self.registry)
+
+    def _row(self,item_id:str) -> int:
+        """item_id在rows中的行号，不在其中时为-1"""
+        row = bisect_left(self.rows,id_key(item_id),key=id_key)
+        return row if row < len(self.rows) and self.rows[row] == item_id else -1
+
+    def add(self,item_id:str) -> None:
+        if item_id in self.registry:
+            return
+        self.registry[item_id] = None
+        if self.pattern not in item_id:
+            return
+        row = bisect_left(self.rows,id_key(item_id),key=id_key)
+        # 所有行都已交给视图时新的行直接显示，否则等视图滚动到末尾时再取
+        if row < self.fetched or self.fetched == len(self.rows):
+            self.beginInsertRows(QModelIndex(),row,row)
+            self.rows.insert(row,item_id)
+            self.fetched += 1
+            self.endInsertRows()
+        else:
+            self.rows.insert(row,item_id)
+
+    def extend(self,item_ids:Iterable[str]) -> None:
+        """一次登记大量图元，如打开画布文件时，视图只在需要时取前面的行"""
+        self.beginResetModel()
+        for item_id in item_ids:
+            self.registry[item_id] = None
+        self.rows = sorted((item_id for item_id in self.registry if self.pattern in item_id),key=id_key)
+        self.fetched = min(self.FETCH,len(self.rows))
+        self.endResetModel()
+
+    def remove(self,item_id:str) -> None:
+        if item_id not in self.registry:
+            return
+        del self.registry[item_id]
+        row = self._row(item_id)
+        if row < 0:
+            return
+        if row < self.fetched:
+            self.beginRemoveRows(QModelIndex(),row,row)
+            del self.rows[row]
+            self.fetched -= 1
+            self.endRemoveRows()
+        else:
+            del self.rows[row]
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.registry.clear()
+        self.rows.clear()
+        self.fetched = 0
+        self.endResetModel()
+
+    def setFilter(self,pattern:str) -> None:
+        """只显示id中包含pattern的图元"""
+        self.beginResetModel()
+        self.pattern = pattern
+        self.rows = sorted((item_id for item_id in self.registry if pattern in item_id),key=id_key)
+        self.fetched = min(self.FETCH,len(self.rows))
+        self.endResetModel()
+
+    def index_of(self,item_id:str) -> QModelIndex:
+        """item_id所在行的索引，不在已交给视图的行中时无效"""
+        row = self._row(item_id)
+        return self.index(row) if 0 <= row < self.fetched else QModelIndex()
+
+    def rowCount(self,parent:QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.fetched
+
+    def canFetchMore(self,parent:QModelIndex) -> bool:
+        return not parent.isValid() and self.fetched < len(self.rows)
+
+    def fetchMore(self,parent:QModelIndex) -> None:
+        count = min(self.FETCH,len(self.rows) - self.fetched)
+        self.beginInsertRows(QModelIndex(),self.fetched,self.fetched + count - 1)
+        self.fetched += count
+        self.endInsertRows()
+
+    def data(self,index:QModelIndex,role:int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and index.isValid() and index.row() < self.fetched:
+            return self.rows[index.row()]
+        return None
@@ -1,6 +1,14 @@
 import pickle
+import canvasfile
+import numpy as np
+from history import HistoryStack
 from typing import List,Dict
-from item import ItemDesc,MyItem
+from item import ItemDesc,MyItem,raster_cache
+from spatial import GridIndex,RECT
+from utils import join_point_lists,split_point_lists
+from tiles import TileLayer
+from framebuffer import FrameBuffer
+from tracing import traced
 from PyQt5.QtWidgets import(
 	QGraphicsView
 )
@@ -9,45 +17,55 @@ from PyQt5.QtGui import QColor
 
 class OPRecord:
 	def __init__(self,view:QGraphicsView) -> None:
-		self.redo_stk:List[ItemDesc] = []
-		self.undo_stk:List[ItemDesc] = []
+		self.redo_stk = HistoryStack(live=self.isLive)
+		self.undo_stk = HistoryStack(live=self.isLive)
 		self.view:QGraphicsView = view
 		self.item_mp:Dict[str,MyItem] = {}
+		self.index = GridIndex()
 		self.tmp_item = None
+		# 静态图元由图块层统一绘制，正在编辑的图元自己绘制
+		self.tiles = TileLayer(self.renderTile)
+		self.view.scene().addItem(self.tiles)
 	
+	@traced('OPRecord.redo')
 	def redo(self):
 		if not self.canRedo():
 			return 
-		desc = self.redo_stk[-1]
-		self.redo_stk.pop()
+		desc = self.redo_stk.pop()
 		self.view.clearSelection()
 		self.do(desc,False)
 		self.finish()
 
+	@traced('OPRecord.undo')
 	def undo(self):
 		if not self.canUndo():
 			return
-		desc = self.undo_stk[-1]
-		self.undo_stk.pop()
+		desc = self.undo_stk.pop()
+		if desc.extra != "delete" and desc.item_type in ItemDesc.DRAW:
+			# 换出到磁盘后再换入的绘制记录是副本，重做时应使用场景中图元自身的描述
+			desc = self.item_mp[desc.id].desc
 		self.redo_stk.append(desc)
 		self.view.clearSelection()
 		if desc.extra == "delete":
 			desc  = desc.copy()
 			desc.extra = None
-			item = MyItem(desc)
-			self.view.scene().addItem(item)
-			self.view.addToListWidget(desc.id)
-			self.item_mp[desc.id] = item
+			self.addItem(desc)
 		elif desc.item_type in ItemDesc.DRAW:
 			self.deleteItem(desc.id)
+		elif desc.item_type == "clip":
+			# 记录中的控制点已经作用过裁剪前累积的变换，矩阵要一并复原
+			for id,p_list in zip(desc.ids(),split_point_lists(desc.p_list)):
+				item_desc = self.item_mp[id].desc
+				item_desc.p_list,item_desc.matrix = p_list,alg.IDENTITY.copy()
+				self.updateItem(id)
+			desc.p_list = desc.extra
+			desc.extra = None
 		else:
-			item = self.item_mp[desc.id]
-			item.desc.p_list=alg.p_transform(desc.item_type,item.desc.p_list,desc.p_list,desc.algorithm,True)
-			desc.p_list = desc.extra if desc.item_type == "clip" else desc.p_list
+			self.transformItems(desc.ids(),alg.p_matrix(desc.item_type,desc.p_list,True))
 			desc.extra = None
 		self.view.actionChanged.emit()
-		self.view.scene().update()
 
+	@traced('OPRecord.do')
 	def do(self,desc:ItemDesc,clear=True):
 		self.undo_stk.append(desc)
 		if clear:
@@ -61,45 +79,173 @@ class OPRecord:
 		elif desc.item_type in ItemDesc.DRAW:
 			self.view.scene().addItem(self.tmp_item)
 			self.item_mp[desc.id] = self.tmp_item
+			self.index.insert(desc.id,self.tmp_item.bounds())
 		else:
-			self.item_mp[desc.id].desc.extra = desc
+			for id in desc.ids():
+				item = self.item_mp[id]
+				self.activate(item)
+				item.desc.extra = desc
+				item.invalidate()
 		self.view.actionChanged.emit()
-		self.view.scene().update()
 	
+	@traced('OPRecord.finish')
 	def finish(self) -> bool:
 		trans = self.undo_stk[-1]
 		if trans.extra == "delete":
 			return False
-		item = self.item_mp[trans.id]
 		trans.item_type = "clip" if trans.extra == "clip" else trans.item_type			
-		if trans.item_type not in ItemDesc.DRAW:
-			desc = item.desc
-			p_list = alg.p_transform(trans.item_type,desc.p_list,trans.p_list,trans.algorithm)
-			if trans.item_type == "clip" :
-				trans.extra,trans.p_list  = trans.p_list , desc.p_list
-				self.view.scene().removeItem(self.tmp_item)
-			desc.extra, desc.p_list = None , p_list
-		self.view.addToListWidget(trans.id)
-		self.view.scene().update()
+		if trans.item_type in alg.AFFINE:
+			self.transformItems(trans.ids(),alg.p_matrix(trans.item_type,trans.p_list))
+			return True
+		if trans.item_type == "clip":
+			self.clipItems(trans)
+			return True
+		self.view.addToList(trans.id)
+		self.item_mp[trans.id].tiled = True
+		self.updateItem(trans.id)
 		return trans.item_type not in ItemDesc.APPEND
 
+	def clipItems(self,trans:ItemDesc):
+		"""用trans的裁剪窗口裁剪选中的图元，不能裁剪的图元保持不变
+		完成后trans.id只含被裁剪的图元，trans.extra为裁剪窗口，trans.p_list为这些图元裁剪前的控制点，由join_point_lists连接
+		"""
+		window = tuple(trans.p_list.array.ravel().tolist())
+		ids = [id for id in trans.ids() if self.item_mp[id].desc.item_type in alg.CLIP_TYPES]
+		p_lists = []
+		for id in ids:
+			desc = self.item_mp[id].desc
+			# 裁剪需要真实坐标，先把累积的变换作用到控制点上
+			p_list = alg.apply_matrix(desc.p_list,desc.matrix)
+			p_lists.append(p_list)
+			desc.p_list,desc.matrix = alg.clip_shape(desc.item_type,p_list,window,trans.algorithm),alg.IDENTITY.copy()
+			desc.extra = None
+			self.item_mp[id].tiled = True
+			self.updateItem(id)
+		trans.id,trans.extra,trans.p_list = ItemDesc.GROUP_SEP.join(ids),trans.p_list,join_point_lists(p_lists)
+		self.view.scene().removeItem(self.tmp_item)
+		self.tmp_item.release()
+
+	def transformItems(self,ids:List[str],matrix:np.ndarray):
+		"""把同一个仿射变换作用到一组图元上，所有图元的变换矩阵一次批量相乘"""
+		items = [self.item_mp[id] for id in ids]
+		matrices = matrix @ np.stack([item.desc.matrix for item in items])
+		for item,item_matrix in zip(items,matrices):
+			item.desc.matrix = item_matrix
+			item.desc.extra = None
+			item.tiled = True
+			self.updateItem(item.desc.id)
+
+	@traced('OPRecord.refresh')
+	def refresh(self):
+		"""绘制或变换过程中正在编辑的控制点被修改后调用，更新相应图元的缓存和索引"""
+		trans = self.undo_stk[-1]
+		if trans.item_type in alg.AFFINE:
+			items = [self.item_mp[id] for id in trans.ids()]
+		else:
+			items = [self.tmp_item]
+		for item in items:
+			self.activate(item)
+			item.invalidate()
+			id = item.desc.id
+			if id in self.index and self.item_mp.get(id) is item:
+				self.index.update(id,item.bounds())
+
+	def activate(self,item:MyItem):
+		"""图元开始被编辑，从图块中移出，之后由图元自己绘制，直到finish"""
+		if item.tiled:
+			item.tiled = False
+			self.tiles.invalidate(self.index.get(item.desc.id))
+			item.update()
+
+	def updateItem(self,id):
+		"""图元改变后清除缓存并更新索引，静态图元同时让改变前后覆盖的图块失效"""
+		item = self.item_mp[id]
+		item.invalidate()
+		if item.tiled:
+			self.tiles.invalidate(self.index.get(id))
+			self.tiles.invalidate(item.bounds())
+		self.index.update(id,item.bounds())
+
+	def renderTile(self,fb:FrameBuffer):
+		"""把与帧缓冲相交的静态图元按叠放次序写入帧缓冲"""
+		for item in self.itemsIn(fb.window):
+			if item.tiled:
+				item.blit(fb)
+
+	def itemsIn(self,rect:RECT) -> List[MyItem]:
+		"""返回包围盒与rect相交的图元，按叠放次序从下到上排列"""
+		return [self.item_mp[id] for id in self.index.query(rect)]
+
+	def addItem(self,desc:ItemDesc,listed = True) -> MyItem:
+		"""
+		:param listed: 为False时不加入侧栏的图元列表，由调用者批量加入
+		"""
+		item = MyItem(desc)
+		item.tiled = True
+		self.view.scene().addItem(item)
+		if listed:
+			self.view.addToList(desc.id)
+		self.item_mp[desc.id] = item
+		self.index.insert(desc.id,item.bounds())
+		self.tiles.invalidate(item.bounds())
+		return item
+
 	def saveToFile(self,file_name):
-		file = open(file_name,"wb")
-		h,w = self.view.height(),self.view.width()
-		pickle.dump([h,w,self.undo_stk,self.redo_stk], file)
+		rect = self.view.scene().sceneRect()
+		scene = [item.desc for item in self.item_mp.values()]
+		canvasfile.save(file_name,int(rect.height()),int(rect.width()),scene,self.undo_stk,self.redo_stk,lambda color: color.getRgb())
 
 	def loadFromFile(self,file_name):
+		if not canvasfile.is_canvas_file(file_name):
+			self.loadPickle(file_name)
+			return
+		canvas = canvasfile.CanvasFile(file_name,lambda rgba: QColor(*rgba))
+		self.view.reset(canvas.width,canvas.height)
+		# 直接恢复当前场景，不需要重放历史记录
+		for desc in canvas.scene():
+			desc.selected = False
+			self.addItem(desc,False)
+		self.view.addToList(*self.item_mp)
+		# 历史记录只登记记录下标，撤销时才解码
+		self.undo_stk = HistoryStack(canvas,canvas.index['undo'],live=self.isLive)
+		self.redo_stk = HistoryStack(canvas,canvas.index['redo'],live=self.isLive)
+		self.view.actionChanged.emit()
+
+	def loadPickle(self,file_name):
+		"""读取旧版本以pickle保存的画布"""
 		file = open(file_name,"rb")
 		objs = pickle.load(file)
 		self.view.reset(objs[0],objs[1])
 		for op in objs[2]:
+			if op.extra != "delete" and op.item_type not in ItemDesc.DRAW:
+				# 旧版本的绘制记录就是图元自身的描述，保存时已包含之后各次变换的结果，变换记录只需登记
+				if op.item_type == "clip":
+					# 旧版本只能裁剪单个图元，记录中是它裁剪前的控制点
+					op.p_list = join_point_lists([op.p_list])
+				self.undo_stk.append(op)
+				continue
 			self.do(op)
 			self.finish()
-		self.redo_stk = objs[3]
+		self.redo_stk = HistoryStack(live=self.isLive)
+		for desc in objs[3]:
+			self.redo_stk.append(desc)
+
+	def compact(self):
+		"""压缩历史记录：以当前场景为新的起点，丢弃全部撤销记录，重做记录不受影响
+		正在绘制的多边形或曲线的记录保留在栈顶，之后的refresh和finish还要用到它
+		"""
+		drawing = self.canUndo() and self.undo_stk[-1] is self.view.tmp_desc
+		top = self.undo_stk[-1] if drawing else None
+		self.undo_stk.clear()
+		if top is not None:
+			self.undo_stk.append(top)
+		self.view.actionChanged.emit()
 
 	def select(self,id,selected = True):
-		self.item_mp[id].desc.selected = selected
-		self.view.scene().update()
+		for id in id.split(ItemDesc.GROUP_SEP):
+			item = self.item_mp[id]
+			item.desc.selected = selected
+			item.update()
 
 	def delete(self,item_id):
 		desc = self.item_mp[item_id].desc.copy()
@@ -110,16 +256,32 @@ class OPRecord:
 		self.redo_stk.clear()
 		self.undo_stk.clear()
 		self.item_mp.clear()
+		self.index.clear()
+		raster_cache.clear()
+		# 图块层在清空场景后继续使用
+		self.view.scene().removeItem(self.tiles)
 		self.view.scene().clear()
+		self.tiles.clear()
+		self.view.scene().addItem(self.tiles)
 		self.view.actionChanged.emit()
 
 	def deleteItem(self,id):
-		self.view.removeFromListWidget(id)
+		self.view.removeFromList(id)
 		self.view.scene().removeItem(self.item_mp[id])
-		self.item_mp.pop(id)
+		if self.item_mp[id].tiled:
+			self.tiles.invalidate(self.index.get(id))
+		self.item_mp.pop(id).release()
+		self.index.remove(id)
+
+	def isLive(self,desc:ItemDesc) -> bool:
+		"""desc是否就是场景中某个图元自身的描述，这样的历史记录换出到磁盘也释放不了内存"""
+		item = self.item_mp.get(desc.id)
+		return item is not None and item.desc is desc
 
 	def canClip(self,id) -> bool:
-		return self.item_mp[id].desc.item_type == "line"
+		"""选中的图元中至少有一个能被裁剪"""
+		ids = id.split(ItemDesc.GROUP_SEP)
+		return all(id in self.item_mp for id in ids) and any(self.item_mp[id].desc.item_type in alg.CLIP_TYPES for id in ids)
 	
 	def canRedo(self) -> bool:
 		return len(self.redo_stk) != 0
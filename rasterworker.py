@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+RASTER_WORKERS = min(4,os.cpu_count() or 1)  # 后台光栅化的线程数
+
+class RasterWorker(QObject):
+    """
+    在线程池中执行光栅化任务，完成后通过信号回到GUI线程交付结果
+
+    每个所有者（图元）同时只保留一个任务：提交新任务或所有者改变时取消旧任务，
+    已经开始执行而无法取消的旧任务完成后结果被丢弃
+    """
+    finished = pyqtSignal(object,object)    # (所有者, 完成的Future)，跨线程发射时以排队方式送到GUI线程
+
+    def __init__(self,workers:int = RASTER_WORKERS) -> None:
+        super().__init__()
+        self.pool = ThreadPoolExecutor(max_workers=workers,thread_name_prefix='raster')
+        self.jobs:Dict[Hashable,Tuple[tuple,Future,Callable[[Any],None]]] = {}
+        self.finished.connect(self._deliver)
+
+    def key(self,owner:Hashable) -> tuple|None:
+        job = self.jobs.get(owner)
+        return job[0] if job is not None else None
+
+    def pending(self,owner:Hashable,key:tuple) -> bool:
+        job = self.jobs.get(owner)
+        return job is not None and job[0] == key
+
+    def submit(self,owner:Hashable,key:tuple,func:Callable,args:tuple,callback:Callable[[Any],None]) -> None:
+        """提交任务，相同的任务已在执行时直接返回
+
+        :param owner: 任务所有者，同一所有者的旧任务被取消
+        :param key: 任务输入的标识，用来判断是否已经提交过
+        :param func: 在工作线程中执行的函数，不能访问Qt对象，参数应是不会再被修改的副本
+        :param callback: 在GUI线程中以func的返回值调用
+        """
+        if self.pending(owner,key):
+            return
+        self.cancel(owner)
+        future = self.pool.submit(func,*args)
+        self.jobs[owner] = (key,future,callback)
+        future.add_done_callback(lambda future: future.cancelled() or self.finished.emit(owner,future))
+
+    def cancel(self,owner:Hashable) -> None:
+        job = self.jobs.pop(owner,None)
+        if job is not None:
+            job[1].cancel()
+
+    def wait(self,owner:Hashable) -> Any:
+        """在GUI线程中等待任务完成并立即交付结果，之后排队送到的完成信号被忽略"""
+        key,future,callback = self.jobs.pop(owner)
+        result = future.result()
+        callback(result)
+        return result
+
+    def _deliver(self,owner:Hashable,future:Future) -> None:
+        job = self.jobs.get(owner)
+        if job is None or job[1] is not future:
+            return
+        del self.jobs[owner]
+        job[2](future.result())
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+RECT = Tuple[int,int,int,int]  # (x_min, y_min, x_max, y_max)，边界包含在内
+
+class GridIndex:
+    """
+    均匀网格空间索引，每个键按包围盒登记到它覆盖的所有格子中，查询时只检查与查询矩形相交的格子
+    """
+    def __init__(self,cell:int = 128) -> None:
+        self.cell = cell
+        self.cells:Dict[Tuple[int,int],Set[Hashable]] = defaultdict(set)
+        self.rects:Dict[Hashable,Tuple[RECT,int]] = {}
+        self.counter = 0
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self,key:Hashable) -> bool:
+        return key in self.rects
+
+    def _cells(self,rect:RECT) -> Iterator[Tuple[int,int]]:
+        x_min,y_min,x_max,y_max = rect
+        for i in range(x_min // self.cell,x_max // self.cell + 1):
+            for j in range(y_min // self.cell,y_max // self.cell + 1):
+                yield i,j
+
+    def get(self,key:Hashable) -> RECT|None:
+        """键登记的包围盒，未登记时为None"""
+        entry = self.rects.get(key)
+        return entry[0] if entry else None
+
+    def insert(self,key:Hashable,rect:RECT) -> None:
+        """登记键，后插入的键在查询结果中排在后面，与场景中图元的叠放次序一致"""
+        self.remove(key)
+        self.counter += 1
+        self._place(key,rect,self.counter)
+
+    def update(self,key:Hashable,rect:RECT) -> None:
+        """更新键的包围盒，保持原有次序"""
+        if key not in self.rects:
+            self.insert(key,rect)
+            return
+        old,order = self.rects[key]
+        if old == rect:
+            return
+        self._unplace(key,old)
+        self._place(key,rect,order)
+
+    def remove(self,key:Hashable) -> None:
+        if key in self.rects:
+            self._unplace(key,self.rects.pop(key)[0])
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.rects.clear()
+        self.counter = 0
+
+    def query(self,rect:RECT) -> List[Hashable]:
+        """返回包围盒与rect相交的键，按插入次序排列"""
+        x_min,y_min,x_max,y_max = rect
+        found:Set[Hashable] = set()
+        n_cells = (x_max // self.cell - x_min // self.cell + 1) * (y_max // self.cell - y_min // self.cell + 1)
+        if n_cells > len(self.rects):
+            # 查询范围覆盖的格子比登记的键还多时，直接逐个检查更快
+            found = set(self.rects)
+        else:
+            for cell in self._cells(rect):
+                keys = self.cells.get(cell)
+                if keys:
+                    found |= keys
+        result = []
+        for key in found:
+            (a,b,c,d),order = self.rects[key]
+            if a <= x_max and c >= x_min and b <= y_max and d >= y_min:
+                result.append((order,key))
+        result.sort(key=lambda entry: entry[0])
+        return [key for _,key in result]
+
+    def _place(self,key:Hashable,rect:RECT,order:int) -> None:
+        self.rects[key] = (rect,order)
+        for cell in self._cells(rect):
+            self.cells[cell].add(key)
+
+    def _unplace(self,key:Hashable,rect:RECT) -> None:
+        for cell in self._cells(rect):
+            keys = self.cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self.cells[cell]
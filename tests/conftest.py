@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# 被测模块都在仓库根目录下
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='module')
+def window():
+    """不显示的主窗口，没有PyQt5时跳过"""
+    os.environ.setdefault('QT_QPA_PLATFORM','offscreen')
+    QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    from gui import MainWindow
+    window = MainWindow()
+    yield window
+    window.modified = False
+    window.close()
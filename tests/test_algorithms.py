@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+import algorithms as alg
+from utils import PointList
+
+def reference_line(x0:int, y0:int, x1:int, y1:int, algorithm:str) -> list:
+    """逐点实现的draw_line，与向量化之前的版本逐像素一致"""
+    if (x0,y0) == (x1,y1):
+        return [(x0,y0)]
+    sign_x,sign_y = int(np.sign(x1 - x0)),int(np.sign(y1 - y0))
+    if x0 == x1:
+        return [(x0,y) for y in range(y0,y1 + sign_y,sign_y)]
+    k = (y0 - y1) / (x0 - x1)
+    result = []
+    if algorithm == 'Naive':
+        for x in range(x0,x1 + sign_x,sign_x):
+            result.append((x,round(k * (x - x0) + y0)))
+    elif algorithm == 'DDA':
+        if abs(k) > 1:
+            x_begin = x0
+            for y in range(y0,y1 + sign_y,sign_y):
+                result.append((round(x_begin),y))
+                x_begin += sign_y / k
+        else:
+            y_begin = y0
+            for x in range(x0,x1 + sign_x,sign_x):
+                result.append((x,round(y_begin)))
+                y_begin += sign_x * k
+    else:
+        dx,dy = abs(x1 - x0),abs(y1 - y0)
+        if abs(k) > 1:
+            p,x = 2 * dx - dy,x0
+            for y in range(y0,y1 + sign_y,sign_y):
+                result.append((x,y))
+                if p > 0:
+                    x += sign_x
+                    p -= 2 * dy
+                p += 2 * dx
+        else:
+            p,y = 2 * dy - dx,y0
+            for x in range(x0,x1 + sign_x,sign_x):
+                result.append((x,y))
+                if p > 0:
+                    y += sign_y
+                    p -= 2 * dx
+                p += 2 * dy
+    return result
+
+def random_segments(seed:int, count:int, span:int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    seg = rng.integers(-span,span,size=(count,4))
+    # 覆盖水平、竖直、对角线和退化为一点的线段
+    seg[:8,3] = seg[:8,1]
+    seg[8:16,2] = seg[8:16,0]
+    seg[16:24,2:] = seg[16:24,:2] + rng.integers(-span,span,size=(8,1))
+    seg[24:32,2:] = seg[24:32,:2]
+    return seg
+
+@pytest.mark.parametrize('algorithm',['Naive','DDA','Bresenham'])
+@pytest.mark.parametrize('span',[8,100,2000])
+def test_draw_line_matches_reference(algorithm,span):
+    for x0,y0,x1,y1 in random_segments(span,200,span).tolist():
+        pixels = alg.draw_line(PointList([[x0,y0],[x1,y1]]),algorithm)
+        assert pixels.array.tolist() == [list(p) for p in reference_line(x0,y0,x1,y1,algorithm)]
+
+@pytest.mark.parametrize('algorithm',['Naive','DDA','Bresenham'])
+def test_rasterize_lines_batch_matches_reference(algorithm):
+    seg = random_segments(1,200,300)
+    expected = [list(p) for s in seg.tolist() for p in reference_line(*s,algorithm)]
+    assert alg.rasterize_lines(seg,algorithm).tolist() == expected
+
+@pytest.mark.parametrize('width',range(1,7))
+@pytest.mark.parametrize('height',range(1,7))
+def test_small_ellipse_not_empty(width,height):
+    pixels = alg.draw_ellipse(PointList([[5,5],[5 + width,5 + height]]),'').array
+    assert len(pixels) > 0
+    # 上下左右的边都有像素，且不超出包围框
+    assert pixels[:,0].min() == 5 and pixels[:,0].max() == 5 + width
+    assert pixels[:,1].min() == 5 and pixels[:,1].max() == 5 + height
+
+@pytest.mark.parametrize('algorithm',['Cohen-Sutherland','Liang-Barsky'])
+def test_clip_matches_clip_lines(algorithm):
+    seg = random_segments(2,400,200)
+    window = (-60,80,90,-40)
+    clipped,keep = alg.clip_lines(seg,window,algorithm)
+    for s,c,k in zip(seg.tolist(),clipped,keep):
+        result = alg.clip(PointList(np.reshape(s,(2,2))),*window,algorithm)
+        assert result.array.tolist() == (PointList(c.reshape(2,2)).array.tolist() if k else [])
+
+def de_casteljau(ctrl:np.ndarray, u:float) -> np.ndarray:
+    while len(ctrl) > 1:
+        ctrl = ctrl[:-1] * (1 - u) + ctrl[1:] * u
+    return ctrl[0]
+
+@pytest.mark.parametrize('n',[4,40,1100])
+def test_sampled_bezier_matches_de_casteljau(n):
+    ctrl = np.random.default_rng(n).integers(0,2000,(n,2))
+    pixels = alg.draw_curve(PointList(ctrl),'Bezier',tolerance=0).array
+    u = alg.curve_params()
+    assert len(pixels) == len(u)
+    for i in [0,1,len(u) // 3,len(u) // 2,len(u) - 2,len(u) - 1]:
+        np.testing.assert_allclose(pixels[i],de_casteljau(ctrl.astype(np.float64),u[i]),atol=1)
+
+def polyline_distance(points:np.ndarray, q:np.ndarray) -> np.ndarray:
+    """q中每个点到折线points的距离"""
+    a,d = points[:-1],np.diff(points,axis=0)
+    t = np.clip(np.einsum('qsk,sk->qs',q[:,None] - a,d) / np.maximum(np.sum(d * d,axis=1),1e-12),0,1)
+    return np.min(np.hypot(*np.moveaxis(a + t[:,:,None] * d - q[:,None],2,0)),axis=1)
+
+@pytest.mark.parametrize('n,span',[(20,300),(40,300),(200,300),(600,2000)])
+def test_flatten_bezier_within_tolerance(n,span):
+    ctrl = np.random.default_rng(n).integers(0,span,(n,2)).astype(np.float64)
+    points = alg.flatten_bezier(ctrl.tolist())
+    np.testing.assert_allclose(points[[0,-1]],ctrl[[0,-1]])
+    u = np.linspace(0,1,401)
+    curve = np.array([de_casteljau(ctrl,x) for x in u])
+    assert np.max(polyline_distance(points,curve)) <= alg.BEZIER_TOLERANCE + 1e-6
+
+@pytest.mark.parametrize('type',['curve','ellipse','freenom'])
+def test_clip_shape_rejects_other_types(type):
+    with pytest.raises(ValueError):
+        alg.clip_shape(type,PointList([[0,0],[50,50],[100,0]]),(10,10,60,60),'Liang-Barsky')
@@ -0,0 +1,52 @@
+import canvasfile
+import algorithms as alg
+from itemdesc import ItemDesc
+from utils import PointList
+
+def geometry(op_record) -> dict:
+    return {id:alg.apply_matrix(item.desc.p_list,item.desc.matrix).array.tolist() for id,item in op_record.item_mp.items()}
+
+def test_save_load_round_trip(window,tmp_path):
+    from PyQt5.QtGui import QColor
+    window.canvas.reset()
+    op_record = window.canvas.op_record
+    ops = [('1','line',[[10,10],[300,200]],'Bresenham'),
+           ('2','polygon',[[50,50],[250,60],[150,220]],'DDA'),
+           ('3','curve',[[20,300],[120,100],[220,380],[320,250]],'Bezier'),
+           ('1','translate',[[0,0],[15,-5]],''),
+           ('2','rotate',[[150,110],[250,110],[150,210]],''),
+           ('1','clip',[[0,0],[200,200]],'Liang-Barsky'),
+           ('2'+ItemDesc.GROUP_SEP+'3','scale',[[100,100],[200,100],[150,100]],'')]
+    for id,type,points,algorithm in ops:
+        if type not in ItemDesc.DRAW:
+            window.canvas.selectionChanged(id)
+        op_record.do(ItemDesc(id,type,PointList(points),algorithm,QColor(0,0,255)))
+        op_record.refresh()
+        op_record.finish()
+    op_record.delete('3')
+    op_record.undo()
+    op_record.undo()
+    assert len(op_record.undo_stk) == 6 and len(op_record.redo_stk) == 2
+    file_name = str(tmp_path / 'round.canvas')
+    op_record.saveToFile(file_name)
+
+    canvas = canvasfile.CanvasFile(file_name)
+    assert sorted(desc.id for desc in canvas.scene()) == sorted(op_record.item_mp)
+    assert [desc.item_type for desc in canvas.undo_stk()] == [desc.item_type for desc in op_record.undo_stk]
+    assert [desc.item_type for desc in canvas.redo_stk()] == [desc.item_type for desc in op_record.redo_stk]
+
+    # 原画布上撤销到底、再重做到头，记下每一步的场景
+    steps = [op_record.undo] * len(op_record.undo_stk) + [op_record.redo] * (len(op_record.undo_stk) + len(op_record.redo_stk))
+    states = [geometry(op_record)]
+    for step in steps:
+        step()
+        states.append(geometry(op_record))
+
+    window.canvas.loadFromFile(file_name)
+    op_record = window.canvas.op_record
+    assert geometry(op_record) == states[0]
+    for step,state in zip(steps,states[1:]):
+        getattr(op_record,step.__name__)()
+        assert geometry(op_record) == state
+    assert not op_record.canRedo()
+    window.canvas.reset()
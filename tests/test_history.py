@@ -0,0 +1,41 @@
+import numpy as np
+
+from history import HistoryStack, entry_nbytes
+from itemdesc import ItemDesc
+from utils import PointList
+
+def make_desc(i:int, n:int = 64) -> ItemDesc:
+    points = np.random.default_rng(i).integers(0,1000,(n,2))
+    return ItemDesc(str(i),'polygon',PointList(points))
+
+def test_spill_and_page_in():
+    descs = [make_desc(i) for i in range(100)]
+    stk = HistoryStack(budget=10 * entry_nbytes(descs[0]))
+    for desc in descs:
+        stk.append(desc)
+    assert stk.n_spilled > 0 and stk.nbytes <= stk.budget
+    assert len(stk) == len(descs)
+    # 遍历不改变栈，顺序从栈底到栈顶
+    assert [desc.id for desc in stk] == [desc.id for desc in descs]
+    assert stk[-30].id == descs[-30].id
+    for desc in reversed(descs):
+        top = stk.pop()
+        assert top.id == desc.id and top.p_list.array.tolist() == desc.p_list.array.tolist()
+    assert len(stk) == 0
+
+def test_live_records_stay_in_memory():
+    descs = [make_desc(i) for i in range(100)]
+    live = {id(desc) for desc in descs[::2]}
+    stk = HistoryStack(budget=10 * entry_nbytes(descs[0]),live=lambda desc: id(desc) in live)
+    for desc in descs:
+        stk.append(desc)
+    # 只有不是图元自身描述的记录才计入预算、写入日志
+    assert stk.nbytes == sum(entry_nbytes(desc) for desc in stk.items if id(desc) not in live)
+    kept = [desc for *_,batch in stk.spilled for desc in batch.values()]
+    assert stk.n_spilled > 0 and {id(desc) for desc in kept} == live & {id(desc) for desc in descs[:stk.n_spilled]}
+    for desc in reversed(descs):
+        top = stk.pop()
+        if id(desc) in live:
+            assert top is desc
+        else:
+            assert top.id == desc.id
@@ -0,0 +1,113 @@
+import numpy as np
+
+import algorithms as alg
+from itemdesc import ItemDesc
+from utils import Point,PointList
+
+def perform(op_record, item_id:str, item_type:str, points:list, algorithm:str = '') -> None:
+    """按画布处理鼠标事件的顺序执行一次绘制或变换"""
+    op_record.do(ItemDesc(item_id,item_type,PointList(points),algorithm))
+    op_record.refresh()
+    op_record.finish()
+
+def geometry(op_record) -> dict:
+    return {id:alg.apply_matrix(item.desc.p_list,item.desc.matrix).array.tolist() for id,item in op_record.item_mp.items()}
+
+def test_undo_redo_clip_after_transform(window):
+    window.canvas.reset()
+    op_record = window.canvas.op_record
+    perform(op_record,'1','line',[[58,58],[408,308]],'Bresenham')
+    states = [geometry(op_record)]
+    for op in [('clip',[[0,0],[300,300]],'Cohen-Sutherland'),
+               ('translate',[[0,0],[30,10]],''),
+               ('clip',[[100,100],[350,350]],'Liang-Barsky')]:
+        window.canvas.selectionChanged('1')
+        perform(op_record,'1',op[0],op[1],op[2])
+        states.append(geometry(op_record))
+    # 两次裁剪都与线段相交
+    assert len(states[1]['1']) == 2 and len(states[3]['1']) == 2
+    for state in reversed(states):
+        assert geometry(op_record) == state
+        op_record.undo()
+    assert op_record.item_mp == {}
+    for state in states:
+        op_record.redo()
+        assert geometry(op_record) == state
+
+def test_undo_redo_random_session(window):
+    window.canvas.reset()
+    op_record = window.canvas.op_record
+    rng = np.random.default_rng(7)
+    perform(op_record,'1','line',[[58,58],[408,308]],'DDA')
+    perform(op_record,'2','polygon',[[100,80],[380,120],[300,360],[60,280]],'Bresenham')
+    states = [geometry(op_record)]
+    for _ in range(40):
+        item_id = str(rng.integers(1,3))
+        x,y = np.mean(geometry(op_record)[item_id],axis=0).astype(int).tolist()
+        kind = rng.choice(['translate','rotate','scale','clip'])
+        if kind == 'translate':
+            points = [[x,y],[x + int(rng.integers(-20,21)),y + int(rng.integers(-20,21))]]
+        elif kind == 'rotate':
+            points = [[x,y],[x + int(rng.integers(-50,51)),y + 50]]
+        elif kind == 'scale':
+            points = [[x,y],[x + int(rng.integers(45,56)),y + int(rng.integers(45,56))]]
+        else:
+            # 裁剪窗口包含图元的中心附近，裁剪后不会为空
+            r = int(rng.integers(20,200))
+            points = [[x - r,y - r],[x + r,y + r]]
+        window.canvas.selectionChanged(item_id)
+        perform(op_record,item_id,kind,points,rng.choice(['Cohen-Sutherland','Liang-Barsky']) if kind == 'clip' else '')
+        states.append(geometry(op_record))
+    # 撤销变换只是乘上逆矩阵，取整后可能相差一个像素
+    for state in reversed(states):
+        actual = geometry(op_record)
+        assert sorted(actual) == sorted(state)
+        for id in state:
+            np.testing.assert_allclose(actual[id],state[id],atol=1)
+        op_record.undo()
+    for state in states:
+        op_record.redo()
+        assert geometry(op_record) == state
+
+def test_compact_while_drawing_polygon(window):
+    window.canvas.reset()
+    op_record = window.canvas.op_record
+    perform(op_record,'1','line',[[10,10],[200,120]],'DDA')
+    # 多边形逐点绘制，记录在绘制完之前一直是画布的tmp_desc
+    desc = window.canvas.tmp_desc = ItemDesc('2','polygon',PointList([[50,50],[150,50]]),'Bresenham')
+    op_record.do(desc)
+    op_record.refresh()
+    op_record.finish()
+    op_record.compact()
+    assert len(op_record.undo_stk) == 1 and op_record.undo_stk[-1] is desc
+    desc.p_list.append(Point(150,150))
+    op_record.refresh()
+    op_record.finish()
+    window.canvas.tmp_desc = None
+    op_record.compact()
+    assert not op_record.canUndo()
+    assert geometry(op_record)['2'] == [[50,50],[150,50],[150,150]]
+
+def test_clip_selection_is_one_operation(window):
+    window.canvas.reset()
+    op_record = window.canvas.op_record
+    perform(op_record,'1','line',[[0,0],[400,400]],'DDA')
+    perform(op_record,'2','polygon',[[50,50],[350,50],[350,350],[50,350]],'Bresenham')
+    perform(op_record,'3','curve',[[0,300],[200,0],[400,300]],'Bezier')
+    perform(op_record,'4','line',[[300,0],[400,10]],'DDA')
+    group = ItemDesc.GROUP_SEP.join(['1','2','3','4'])
+    assert op_record.canClip(group) and not op_record.canClip('3')
+    window.canvas.selectionChanged(group)
+    perform(op_record,'2'+ItemDesc.GROUP_SEP+'3','translate',[[0,0],[10,10]])
+    before = geometry(op_record)
+    perform(op_record,group,'clip',[[100,100],[200,250]],'Liang-Barsky')
+    after = geometry(op_record)
+    assert after['1'] == [[100,100],[200,200]]
+    assert sorted(after['2']) == [[100,100],[100,250],[200,100],[200,250]]
+    assert after['3'] == before['3'] and after['4'] == []
+    # 整个选区的裁剪是一次操作，曲线不在记录中
+    assert op_record.undo_stk[-1].ids() == ['1','2','4']
+    op_record.undo()
+    assert geometry(op_record) == before
+    op_record.redo()
+    assert geometry(op_record) == after
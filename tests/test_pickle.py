@@ -0,0 +1,49 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import algorithms as alg
+from utils import Point, PointF
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),'data')
+
+@pytest.mark.parametrize('cls',[Point,PointF])
+def test_point_pickle(cls):
+    p = pickle.loads(pickle.dumps(cls(3,-4)))
+    assert (p.x,p.y) == (3,-4)
+
+@pytest.mark.parametrize('cls',[Point,PointF])
+def test_point_accepts_old_state(cls):
+    p = cls.__new__(cls)
+    p.__setstate__({'x':5,'y':6})
+    assert (p.x,p.y) == (5,6)
+    p.__setstate__((None,{'x':7,'y':8}))
+    assert (p.x,p.y) == (7,8)
+
+def test_load_baseline_pickle(window):
+    """baseline.pkl由以pickle保存画布的旧版本生成：绘制5个图元，平移、旋转、缩放各一次，最后一次绘制被撤销；
+    baseline_items.json是旧版本中保存时以及撤销三次变换后各图元的控制点"""
+    op_record = window.canvas.op_record
+    window.canvas.loadFromFile(os.path.join(DATA,'baseline.pkl'))
+    with open(os.path.join(DATA,'baseline_items.json')) as fp:
+        expected = json.load(fp)
+
+    def points():
+        return {id:alg.apply_matrix(item.desc.p_list,item.desc.matrix).array.tolist() for id,item in op_record.item_mp.items()}
+
+    assert points() == expected['saved']
+    assert len(op_record.undo_stk) == 8
+    assert [desc.id for desc in op_record.redo_stk] == ['6']
+    for _ in range(3):
+        op_record.undo()
+    # 旧版本每次变换后取整，累积矩阵只在最后取整，结果可能相差一个像素
+    actual = points()
+    assert sorted(actual) == sorted(expected['undone'])
+    for id,p_list in expected['undone'].items():
+        np.testing.assert_allclose(actual[id],p_list,atol=1)
+    for _ in range(4):
+        op_record.redo()
+    assert points() == {**expected['saved'],'6':[[0,0],[50,50]]}
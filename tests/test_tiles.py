@@ -0,0 +1,50 @@
+import numpy as np
+
+from framebuffer import FrameBuffer
+from itemdesc import ItemDesc
+from utils import PointList
+
+def test_tiles_match_whole_scene(window):
+    from PyQt5.QtGui import QColor
+    canvas = window.canvas
+    canvas.reset(1000,700)
+    op_record = canvas.op_record
+    rng = np.random.default_rng(3)
+    items = [('line',[[5,5],[990,690]],'DDA'),('polygon',[[100,600],[500,30],[900,650]],'Bresenham'),
+             ('ellipse',[[200,200],[700,500]],''),('curve',rng.integers(0,1000,(64,2)),'B-spline'),
+             ('curve',rng.integers(0,700,(8,2)),'Bezier')]
+    for k,(item_type,points,algorithm) in enumerate(items):
+        desc = ItemDesc(str(k),item_type,PointList(points),algorithm,QColor(*rng.integers(0,256,3).tolist()))
+        desc.fill = item_type in ('polygon','ellipse')
+        op_record.addItem(desc)
+    whole = FrameBuffer(1024,768)
+    op_record.renderTile(whole)
+    tiles = op_record.tiles
+    keys = [(i,j) for j in range(3) for i in range(4)]
+    tiles.prepare(keys[3:])
+    for i,j in keys:
+        size = tiles.size
+        image = tiles.tile(i,j)
+        data = np.frombuffer(image.constBits().asstring(image.sizeInBytes()),dtype=np.uint8).reshape(size,size,3)
+        np.testing.assert_array_equal(data,whole.data[j * size:(j + 1) * size,i * size:(i + 1) * size])
+
+def test_finish_keeps_async_raster(window):
+    from PyQt5.QtGui import QColor
+    from item import raster_worker
+    canvas = window.canvas
+    canvas.reset(600,600)
+    op_record = canvas.op_record
+    desc = ItemDesc('1','curve',PointList(np.random.default_rng(5).integers(0,600,(400,2))),'Bezier',QColor(0,0,0))
+    op_record.do(desc)
+    op_record.refresh()
+    item = op_record.item_mp['1']
+    # 正在绘制的图元由后台线程光栅化，之后同步光栅化同样的内容时等待这个任务
+    assert item.rasterize(item.sceneWindow(),wait=False) is None
+    assert raster_worker.pending(id(item),item.rasterKey())
+    layers = item.rasterize(item.sceneWindow())
+    assert not raster_worker.jobs
+    # 绘制完成时控制点没有改变，转入图块后直接使用已有的结果
+    op_record.finish()
+    assert item.tiled and item.rasterize(item.sceneWindow()) is layers
+    op_record.deleteItem('1')
+    assert not raster_worker.jobs
@@ -0,0 +1,119 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtWidgets import (
+    QGraphicsItem,
+    QWidget,
+    QStyleOptionGraphicsItem,
+)
+from PyQt5.QtGui import QPainter, QImage
+from PyQt5.QtCore import QRectF
+
+from framebuffer import FrameBuffer
+from spatial import RECT
+from tracing import tracer,traced
+
+TILE_SIZE = 256  # 图块边长（像素）
+TILE_CACHE_BUDGET = 64 * 1024 * 1024  # 图块缓存的总字节数上限
+
+class TileLayer(QGraphicsItem):
+    """
+    静态图元的图块层，放在所有图元之下
+
+    画布按固定大小切成图块，每块第一次露出时把与它相交的静态图元写入一块软件帧缓冲，
+    之后重绘只需贴图。同一次重绘中缺少的图块合在一块帧缓冲中绘制再切开，每个图元只写入一次。
+    图元改变时只让与它改变前后的包围盒相交的图块失效，
+    图块按LRU淘汰，总字节数不超过预算。正在编辑的图元不进入图块，由图元自己绘制
+    """
+    def __init__(self,render:Callable[[FrameBuffer],None],size:int = TILE_SIZE,budget:int = TILE_CACHE_BUDGET,
+                 parent:QGraphicsItem = None) -> None:
+        """
+        :param render: (callable) 把与帧缓冲相交的静态图元写入帧缓冲
+        :param size: 图块边长
+        :param budget: 图块缓存的总字节数上限，一次绘制的帧缓冲不超过它的四分之一
+        """
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.setZValue(-1)
+        self.render = render
+        self.size = size
+        self.budget = budget
+        self.nbytes = 0
+        # 图块的像素数组和引用它的QImage一起保存
+        self.tiles:OrderedDict[Tuple[int,int],Tuple[np.ndarray,QImage]] = OrderedDict()
+
+    def _tiles(self,rect:RECT) -> Iterator[Tuple[int,int]]:
+        x_min,y_min,x_max,y_max = rect
+        for j in range(max(y_min,0) // self.size,max(y_max,0) // self.size + 1):
+            for i in range(max(x_min,0) // self.size,max(x_max,0) // self.size + 1):
+                yield i,j
+
+    def prepare(self,keys:List[Tuple[int,int]]) -> None:
+        """绘制keys中的图块：按行分批，每批在一块覆盖这些图块的帧缓冲中绘制后切成图块"""
+        if not keys:
+            return
+        size = self.size
+        i_min,i_max = min(i for i,_ in keys),max(i for i,_ in keys)
+        j_min,j_max = min(j for _,j in keys),max(j for _,j in keys)
+        width = (i_max - i_min + 1) * size
+        rows = max(1,self.budget // 4 // (width * size * 3))
+        for j0 in range(j_min,j_max + 1,rows):
+            j1 = min(j0 + rows,j_max + 1)
+            fb = FrameBuffer(width,(j1 - j0) * size,origin=(i_min * size,j0 * size))
+            with tracer.span('tile'):
+                self.render(fb)
+            for i,j in keys:
+                if j0 <= j < j1:
+                    x,y = (i - i_min) * size,(j - j0) * size
+                    self._store((i,j),np.ascontiguousarray(fb.data[y:y + size,x:x + size]))
+
+    def _store(self,key:Tuple[int,int],data:np.ndarray) -> None:
+        image = QImage(data.data,self.size,self.size,self.size * 3,QImage.Format_RGB888)
+        self.tiles[key] = (data,image)
+        self.nbytes += data.nbytes
+        while self.nbytes > self.budget and len(self.tiles) > 1:
+            _,(evicted,_) = self.tiles.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def tile(self,i:int,j:int) -> QImage:
+        """返回第j行第i列的图块，不在缓存中时重新绘制"""
+        entry = self.tiles.get((i,j))
+        if entry is None:
+            self.prepare([(i,j)])
+            entry = self.tiles[(i,j)]
+        else:
+            self.tiles.move_to_end((i,j))
+        return entry[1]
+
+    def invalidate(self,rect:Optional[RECT]) -> None:
+        """让与rect相交的图块失效，重绘由图元自身的update触发"""
+        if rect is None:
+            return
+        for key in self._tiles(rect):
+            entry = self.tiles.pop(key,None)
+            if entry is not None:
+                self.nbytes -= entry[0].nbytes
+
+    def clear(self) -> None:
+        self.tiles.clear()
+        self.nbytes = 0
+
+    def boundingRect(self) -> QRectF:
+        scene = self.scene()
+        return scene.sceneRect() if scene is not None else QRectF()
+
+    @traced('tiles.paint')
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = ...) -> None:
+        exposed = option.exposedRect & self.boundingRect()
+        if exposed.isEmpty():
+            return
+        rect = (math.floor(exposed.left()),math.floor(exposed.top()),math.ceil(exposed.right()) - 1,math.ceil(exposed.bottom()) - 1)
+        painter.save()
+        painter.setClipRect(exposed)
+        keys = list(self._tiles(rect))
+        self.prepare([key for key in keys if key not in self.tiles])
+        for i,j in keys:
+            painter.drawImage(i * self.size,j * self.size,self.tile(i,j))
+        painter.restore()
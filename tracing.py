@@ -0,0 +1,144 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+TRACE_EVENTS = 200000  # 最多保留的耗时事件数，超出后丢弃最旧的
+
+class _Span:
+    """记录一段代码耗时的上下文管理器"""
+    __slots__ = ('tracer','name','start')
+
+    def __init__(self,tracer:'Tracer',name:str) -> None:
+        self.tracer,self.name = tracer,name
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self,*exc) -> None:
+        self.tracer.record(self.name,self.start,time.perf_counter_ns() - self.start)
+
+class _NullSpan:
+    """关闭追踪时使用的空上下文管理器，只有一次属性查找的开销"""
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self,*exc) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """
+    热点路径的计时与计数
+
+    关闭时每个埋点只检查一次enabled；打开后记录每次调用的起止时间和各项计数，
+    status给出最近一段时间的汇总，export导出为Chrome trace格式（chrome://tracing 或 Perfetto 可直接打开）
+    """
+    def __init__(self,enabled:bool = False,capacity:int = TRACE_EVENTS) -> None:
+        self.enabled = enabled
+        self.origin = time.perf_counter_ns()
+        self.events:Deque[Tuple[str,int,int,int]] = deque(maxlen=capacity)  # (名称, 开始ns, 耗时ns, 线程)
+        self.stats:Dict[str,List[int]] = {}     # 名称 -> [调用次数, 总耗时ns, 最长耗时ns]
+        self.counters:Dict[str,int] = {}
+        self.recent:Dict[str,List[int]] = {}    # 上次status之后的调用统计
+        self.recent_counters:Dict[str,int] = {}
+        self.frames = 0
+        self.lock = threading.Lock()
+
+    def enable(self,enabled:bool = True) -> None:
+        self.enabled = enabled
+
+    def reset(self) -> None:
+        with self.lock:
+            self.origin = time.perf_counter_ns()
+            self.events.clear()
+            self.stats.clear()
+            self.counters.clear()
+            self.recent.clear()
+            self.recent_counters.clear()
+            self.frames = 0
+
+    def span(self,name:str) -> _Span|_NullSpan:
+        """with tracer.span(name): ... 统计代码块的耗时"""
+        return _Span(self,name) if self.enabled else _NULL_SPAN
+
+    def record(self,name:str,start:int,duration:int) -> None:
+        with self.lock:
+            self.events.append((name,start,duration,threading.get_ident()))
+            for stats in (self.stats,self.recent):
+                entry = stats.get(name)
+                if entry is None:
+                    stats[name] = [1,duration,duration]
+                else:
+                    entry[0] += 1
+                    entry[1] += duration
+                    entry[2] = max(entry[2],duration)
+
+    def count(self,name:str,n:int = 1) -> None:
+        """累加计数，如输出的像素数、每帧绘制的图元数"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name,0) + n
+            self.recent_counters[name] = self.recent_counters.get(name,0) + n
+
+    def frame(self) -> None:
+        """一帧绘制完成"""
+        self.count('frames')
+
+    def status(self) -> str:
+        """最近一段时间的汇总，用于状态栏，调用后重新开始统计"""
+        with self.lock:
+            recent,counters = self.recent,self.recent_counters
+            self.recent,self.recent_counters = {},{}
+        frames = counters.get('frames',0)
+        parts = ['%s %d次 %.1fms' % (name,n,total / 1e6) for name,(n,total,_) in sorted(recent.items(),key=lambda kv: -kv[1][1])[:4]]
+        if frames:
+            parts.append('%d帧 每帧%.1f个图元' % (frames,counters.get('items_painted',0) / frames))
+        parts.append('像素 %d' % counters.get('pixels',0))
+        parts.append('包围盒 %d' % counters.get('bounds',0))
+        return ' | '.join(parts)
+
+    def summary(self) -> Dict[str,dict]:
+        """累计统计：每个埋点的调用次数、总耗时和最长耗时（毫秒），以及各项计数"""
+        with self.lock:
+            return {
+                'spans':{name:{'count':n,'total_ms':total / 1e6,'max_ms':longest / 1e6} for name,(n,total,longest) in self.stats.items()},
+                'counters':dict(self.counters),
+            }
+
+    def export(self,file_name:str) -> None:
+        """导出为Chrome trace格式的JSON，累计统计放在stats字段中"""
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+        trace = [{
+            'name':name,'ph':'X','pid':pid,'tid':tid,
+            'ts':(start - self.origin) / 1000,'dur':duration / 1000,
+        } for name,start,duration,tid in events]
+        with open(file_name,'w') as fp:
+            json.dump({'traceEvents':trace,'displayTimeUnit':'ms','stats':self.summary()},fp)
+
+tracer = Tracer(os.environ.get('CG_TRACE','') not in ('','0'))
+
+def traced(name:str) -> Callable[[Callable],Callable]:
+    """函数耗时埋点的装饰器，关闭追踪时只多一次函数调用和属性查找"""
+    def decorator(func:Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args,**kwargs):
+            if not tracer.enabled:
+                return func(*args,**kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                tracer.record(name,start,time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
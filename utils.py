@@ -1,6 +1,9 @@
-from typing import Any
+from typing import Any, Iterator, List
+
+import numpy as np
 
 class Point:
+	__slots__ = ('x','y')
 	x:int
 	y:int
 	def __init__(self,x:Any,y:Any) -> None:
@@ -22,7 +25,14 @@ class Point:
 	def copy(self) -> 'Point':
 		return Point(self.x,self.y)
 
+	def __setstate__(self,state:Any) -> None:
+		# 旧版本的点没有__slots__，pickle中保存的是__dict__
+		if isinstance(state,tuple):
+			state = {**(state[0] or {}),**state[1]}
+		self.x,self.y = state['x'],state['y']
+
 class PointF:
+	__slots__ = ('x','y')
 	x:float
 	y:float
 	def __init__(self,x:Any,y:Any) -> None:
@@ -37,6 +47,97 @@ class PointF:
 	def copy(self) -> 'PointF':
 		return PointF(self.x,self.y)
 
+	def __setstate__(self,state:Any) -> None:
+		# 旧版本的点没有__slots__，pickle中保存的是__dict__
+		if isinstance(state,tuple):
+			state = {**(state[0] or {}),**state[1]}
+		self.x,self.y = state['x'],state['y']
+
+class PointList:
+	"""
+	紧凑的点集，所有点以(N,2)的int32数组连续存储，按下标访问时才生成Point
+	"""
+	__slots__ = ('_buf','_len')
+	def __init__(self,points:Any = None) -> None:
+		if points is None:
+			arr = np.empty((0,2),dtype=np.int32)
+		elif isinstance(points,PointList):
+			arr = points.array.copy()
+		elif isinstance(points,np.ndarray):
+			arr = points.reshape(-1,2)
+		else:
+			arr = np.array([(p.x,p.y) if isinstance(p,(Point,PointF)) else tuple(p) for p in points],dtype=np.float64).reshape(-1,2)
+		if arr.dtype.kind == 'f':
+			arr = np.rint(arr)
+		self._buf = np.ascontiguousarray(arr,dtype=np.int32)
+		self._len = len(self._buf)
+
+	@property
+	def array(self) -> np.ndarray:
+		return self._buf[:self._len]
+
+	@property
+	def xs(self) -> np.ndarray:
+		return self._buf[:self._len,0]
+
+	@property
+	def ys(self) -> np.ndarray:
+		return self._buf[:self._len,1]
+
+	def __len__(self) -> int:
+		return self._len
+
+	def __getitem__(self,index):
+		if isinstance(index,slice):
+			return PointList(self.array[index])
+		x,y = self.array[index]
+		return Point(int(x),int(y))
+
+	def __setitem__(self,index:int,p:Point) -> None:
+		if not self._buf.flags.writeable:
+			# 从文件映射得到的点集是只读的，修改时才复制
+			self._buf = self._buf.copy()
+		self.array[index] = (p.x,p.y)
+
+	def __iter__(self) -> Iterator[Point]:
+		for x,y in self.array.tolist():
+			yield Point(x,y)
+
+	def __reduce__(self):
+		return (PointList,(self.array.copy(),))
+
+	def append(self,p:Point) -> None:
+		if self._len == len(self._buf):
+			buf = np.empty((max(8,2*self._len),2),dtype=np.int32)
+			buf[:self._len] = self._buf[:self._len]
+			self._buf = buf
+		self._buf[self._len] = (p.x,p.y)
+		self._len += 1
+
+	def copy(self) -> 'PointList':
+		return PointList(self)
+
+	@property
+	def nbytes(self) -> int:
+		return self._buf.nbytes
+
+def as_point_list(points:Any) -> PointList:
+	"""将Point列表或坐标数组转换为PointList，已经是PointList时直接返回"""
+	return points if isinstance(points,PointList) else PointList(points)
+
+def join_point_lists(lists:List[PointList]) -> PointList:
+	"""把多个点集连接成一个，每个点集前加一个(点数, 0)，用split_point_lists还原"""
+	return PointList(np.concatenate([np.empty((0,2),dtype=np.int32)] + [np.vstack([(len(p),0),p.array]) for p in lists]))
+
+def split_point_lists(p_list:PointList) -> List[PointList]:
+	"""join_point_lists的逆运算"""
+	arr,lists,i = p_list.array,[],0
+	while i < len(arr):
+		n = int(arr[i,0])
+		lists.append(PointList(arr[i + 1:i + 1 + n].copy()))
+		i += n + 1
+	return lists
+
 def sign(x:int) -> int :
 	if x > 0:
 		return 1